@@ -0,0 +1,377 @@
+"""Load test for the query_db Socket.IO protocol.
+
+Seeds a throwaway database with synthetic barangay data, then runs N
+simulated users. Each user sends a weighted mix of query_db requests, one at
+a time. The report gives latency percentiles and throughput per query_id.
+
+    python benchmark.py --scale 100k --users 16 --duration 30
+    python benchmark.py --proceedings 250000 --mix 6=50,11=30,3=20 --json run.json
+    python benchmark.py --url http://localhost:5000 --users 8
+
+In-process runs use Flask-SocketIO's test client. Requests still take the
+real handle_client_message -> dispatcher -> packet encoding path, with no
+network in between. --url drives a running server instead. That server is
+not seeded, and this mode needs the python-socketio client extras.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+QUERY_NAMES = {
+    1: 'create_case',
+    2: 'fetchCases',
+    3: 'create_proceeding',
+    4: 'update_proceeding',
+    6: 'fetchProceedings',
+    8: 'delete_case',
+    11: 'fetchCasesPage',
+    13: 'fetchTimeline',
+    14: 'searchProceedings',
+    15: 'fetchDashboard',
+}
+
+DEFAULT_MIX = '6=35,11=20,14=10,13=5,15=5,2=5,3=10,4=5,1=5,8=5'
+
+# Words the seeded text is built from, so searches have something to hit
+VOCABULARY = ['boundary', 'noise', 'dispute', 'theft', 'livestock', 'debt', 'curfew',
+              'drainage', 'fence', 'parking', 'barking', 'harassment', 'water', 'lease']
+
+SEED_START = '2024-01-01'
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        query_id, weight = item.split('=')
+        query_id = int(query_id)
+        if query_id not in QUERY_NAMES:
+            raise ValueError(f"Unsupported query_id in mix: {query_id}")
+        mix[query_id] = float(weight)
+    return mix
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def seed(server, proceedings, proceedings_per_case, persons, import_dir):
+    """Write synthetic cases/proceedings/participants/schedules as Parquet and
+    load them through bulk_import, the same path as a real migration. Each
+    participant gets a schedule at its proceeding's time, so timeline queries
+    over SEED_START's year find rows."""
+    cases = max(1, proceedings // proceedings_per_case)
+    words = "[" + ", ".join(f"'{word}'" for word in VOCABULARY) + "]"
+    word = lambda expr: f"{words}[1 + ({expr}) % {len(VOCABULARY)}]"
+    # Proceeding i's minute within SEED_START's year, spread over the whole
+    # year at any scale
+    minute = f"(i * 37 % {proceedings}) * 525600 // {proceedings}"
+    exports = {
+        'cases': f"""
+            SELECT i AS case_id,
+                   'Complaint about ' || {word('i')} AS title,
+                   'Filed over ' || {word('i * 7')} || ' and ' || {word('i * 3')} AS description,
+                   ['low', 'medium', 'high'][1 + i % 3] AS priority,
+                   ['open', 'in_progress', 'resolved', 'closed'][1 + i % 4] AS status
+            FROM range(1, {cases} + 1) r(i)
+        """,
+        'proceedings': f"""
+            SELECT i AS proceeding_id,
+                   1 + i % {cases} AS case_id,
+                   TIMESTAMP '{SEED_START}' + ({minute}) * INTERVAL 1 MINUTE AS start_time,
+                   TIMESTAMP '{SEED_START}' + ({minute} + 60) * INTERVAL 1 MINUTE AS end_time,
+                   'Hearing on ' || {word('i')} AS summary,
+                   'Parties discussed the ' || {word('i * 5')} || ' issue. '
+                       || repeat({word('i * 11')} || ' ', 1 + i % 40) AS content,
+                   ['ongoing', 'adjourned', 'concluded'][1 + i % 3] AS status
+            FROM range(1, {proceedings} + 1) r(i)
+        """,
+        'participants': f"""
+            SELECT i AS proceeding_id,
+                   'person-' || (1 + (i + k * {persons // 2}) % {persons}) AS person_id,
+                   'Resident ' || (1 + (i + k * {persons // 2}) % {persons}) AS name,
+                   ['complainant', 'respondent'][k + 1] AS role
+            FROM range(1, {proceedings} + 1) r(i), range(2) s(k)
+        """,
+        'schedules': f"""
+            SELECT CAST(2 * i + k AS VARCHAR) AS schedule_id,
+                   1 + i % {cases} AS case_id,
+                   'person-' || (1 + (i + k * {persons // 2}) % {persons}) AS person_id,
+                   TIMESTAMP '{SEED_START}' + ({minute}) * INTERVAL 1 MINUTE AS start_time,
+                   TIMESTAMP '{SEED_START}' + ({minute} + 60) * INTERVAL 1 MINUTE AS end_time,
+                   'Proceeding ' || i || ' schedule' AS description,
+                   'scheduled' AS status
+            FROM range(1, {proceedings} + 1) r(i), range(2) s(k)
+        """,
+        'proceeding_schedules': f"""
+            SELECT i AS proceeding_id, CAST(2 * i + k AS VARCHAR) AS schedule_id
+            FROM range(1, {proceedings} + 1) r(i), range(2) s(k)
+        """,
+    }
+
+    with server.db_pool.cursor() as con:
+        con.execute("""
+            INSERT INTO persons (person_id, name)
+            SELECT 'person-' || i, 'Resident ' || i FROM range(1, ? + 1) r(i)
+            ON CONFLICT DO NOTHING
+        """, (persons,))
+        files = {}
+        for name, query in exports.items():
+            path = os.path.join(import_dir, f"{name}.parquet")
+            con.execute(f"COPY ({query}) TO '{path}' (FORMAT parquet)")
+            files[name] = f"{name}.parquet"
+        stats = server.bulk_import(con, files)
+    return cases, stats
+
+
+def is_response(name, args, query_id):
+    # 'change' events and the connect greeting share the socket with replies
+    return name == 'server_message' and args and args[0].get('query_id') == query_id
+
+class InProcessClient:
+    """One simulated user on Flask-SocketIO's test client."""
+
+    def __init__(self, server):
+        self.client = server.socketio.test_client(server.app)
+        # Drop the connect greeting; after that, worker threads append to
+        # this list and popping from the front never reassigns it, unlike
+        # get_received()
+        self.client.get_received()
+        self.messages = self.client.queue
+
+    def request(self, query_id, data, timeout):
+        self.client.emit('query_db', {'query_id': query_id, 'data': data})
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            while self.messages:
+                message = self.messages.pop(0)
+                if is_response(message['name'], message['args'], query_id):
+                    return message['args'][0]
+            time.sleep(0.0002)
+        return {'query_id': query_id, 'error': 'client_timeout'}
+
+    def close(self):
+        self.client.disconnect()
+
+class RemoteClient:
+    """One simulated user connected to a running server."""
+
+    def __init__(self, url):
+        import socketio as socketio_client
+        self.responses = queue.Queue()
+        self.client = socketio_client.Client()
+        self.client.on('server_message', self.responses.put)
+        self.client.connect(url)
+
+    def request(self, query_id, data, timeout):
+        self.client.emit('query_db', {'query_id': query_id, 'data': data})
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                response = self.responses.get(timeout=max(deadline - time.monotonic(), 0))
+                if is_response('server_message', [response], query_id):
+                    return response
+        except queue.Empty:
+            return {'query_id': query_id, 'error': 'client_timeout'}
+
+    def close(self):
+        self.client.disconnect()
+
+
+class Workload:
+    """Builds request payloads against the seeded ID ranges."""
+
+    def __init__(self, cases, proceedings, persons, rng):
+        self.cases = cases
+        self.proceedings = proceedings
+        self.persons = persons
+        self.rng = rng
+        self.created_cases = []
+
+    def person(self):
+        return f"person-{self.rng.randint(1, self.persons)}"
+
+    def build(self, query_id, user_id):
+        rng = self.rng
+        if query_id == 8:
+            if not self.created_cases:
+                # Nothing of ours to delete yet: create instead
+                return self.build(1, user_id)
+            return 8, {'case_id': self.created_cases.pop()}
+        if query_id == 1:
+            return 1, {'title': f"Benchmark case {user_id}", 'description': rng.choice(VOCABULARY),
+                       'priority': 'low', 'status': 'open'}
+        if query_id == 2:
+            return 2, {}
+        if query_id == 3:
+            # Inside the seeded year, so new schedules show up in timelines too
+            start = datetime.fromisoformat(SEED_START) + timedelta(hours=rng.randint(0, 24 * 365 - 1))
+            person_id = self.person()
+            return 3, {'caseId': rng.randint(1, self.cases), 'summary': f"Hearing on {rng.choice(VOCABULARY)}",
+                       'content': " ".join(rng.choices(VOCABULARY, k=50)),
+                       'startTime': start.isoformat(), 'endTime': (start + timedelta(minutes=30)).isoformat(),
+                       'participants': [{'id': person_id, 'name': f"Resident {person_id}", 'role': 'officer'}],
+                       'status': 'ongoing'}
+        if query_id == 4:
+            return 4, {'id': rng.randint(1, self.proceedings), 'summary': f"Updated {rng.choice(VOCABULARY)}"}
+        if query_id == 6:
+            return 6, {'case_id': rng.randint(1, self.cases)}
+        if query_id == 11:
+            return 11, {'sort': rng.choice(['case_id', 'priority', 'created_at']), 'limit': 50}
+        if query_id == 13:
+            # One month of the seeded year
+            year, month = int(SEED_START[:4]), rng.randint(1, 11)
+            return 13, {'person_ids': [self.person() for _ in range(5)],
+                        'from': f"{year}-{month:02d}-01", 'to': f"{year}-{month + 1:02d}-01"}
+        if query_id == 14:
+            return 14, {'query': " ".join(rng.sample(VOCABULARY, 2))}
+        if query_id == 15:
+            return 15, {}
+        raise ValueError(query_id)
+
+    def record(self, query_id, response):
+        if query_id == 1 and 'error' not in response:
+            self.created_cases.append(response['data']['case_id'])
+
+
+def run_user(user_id, client, workload, mix, stop_at, timeout, results):
+    query_ids = list(mix)
+    weights = [mix[query_id] for query_id in query_ids]
+    while time.monotonic() < stop_at:
+        query_id, data = workload.build(workload.rng.choices(query_ids, weights)[0], user_id)
+        started = time.perf_counter()
+        response = client.request(query_id, data, timeout)
+        elapsed = time.perf_counter() - started
+        workload.record(query_id, response)
+        results.append((query_id, elapsed, response.get('error')))
+
+def summarize(samples, wall_seconds):
+    by_query = {}
+    for query_id, elapsed, error in samples:
+        by_query.setdefault(query_id, []).append((elapsed, error))
+
+    report = {}
+    for query_id, rows in sorted(by_query.items()):
+        latencies = sorted(elapsed for elapsed, error in rows if error is None)
+        errors = {}
+        for _, error in rows:
+            if error is not None:
+                errors[error] = errors.get(error, 0) + 1
+        report[query_id] = {
+            'name': QUERY_NAMES.get(query_id, str(query_id)),
+            'requests': len(rows),
+            'errors': errors,
+            'throughput': round(len(rows) / wall_seconds, 2),
+            **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 3) if latencies else None
+               for p in (50, 95, 99)},
+            'max_ms': round(latencies[-1] * 1000, 3) if latencies else None,
+        }
+    return report
+
+def print_report(report, wall_seconds, out):
+    header = f"{'query':>5} {'name':<18} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    fmt = lambda value: f"{value:9.2f}" if value is not None else f"{'-':>9}"
+    total = 0
+    for query_id, row in report.items():
+        total += row['requests']
+        print(f"{query_id:>5} {row['name']:<18} {row['requests']:>7} {sum(row['errors'].values()):>5} "
+              f"{row['throughput']:>8.1f} {fmt(row['p50_ms'])} {fmt(row['p95_ms'])} {fmt(row['p99_ms'])} "
+              f"{fmt(row['max_ms'])}", file=out)
+        if row['errors']:
+            print(f"{'':>5} errors: {row['errors']}", file=out)
+    print("-" * len(header), file=out)
+    print(f"{total} requests in {wall_seconds:.1f}s = {total / wall_seconds:.1f} req/s", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k',
+                        help="seeded proceedings: 1k, 100k or 1m")
+    parser.add_argument('--proceedings', type=int, help="exact number of seeded proceedings (overrides --scale)")
+    parser.add_argument('--proceedings-per-case', type=int, default=10)
+    parser.add_argument('--persons', type=int, default=500)
+    parser.add_argument('--users', type=int, default=8, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--timeout', type=float, default=60.0, help="per-request client timeout")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="query_id=weight pairs, comma separated")
+    parser.add_argument('--db', default=':memory:', help="database path for in-process runs")
+    parser.add_argument('--url', help="benchmark a running server instead of an in-process one")
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--json', help="also write the report (and run settings) to this file")
+    parser.add_argument('--verbose', action='store_true', help="keep the server's own log output")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    proceedings = args.proceedings or SCALES[args.scale]
+    out = sys.stdout
+    import_dir = tempfile.mkdtemp(prefix='barangay-bench-')
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+    try:
+        with quiet:
+            if args.url:
+                cases = max(1, proceedings // args.proceedings_per_case)
+                make_client = lambda: RemoteClient(args.url)
+                seed_stats = None
+            else:
+                # The server module reads its configuration at import time
+                os.environ['BARANGAY_DB_PATH'] = args.db
+                os.environ['BARANGAY_IMPORT_DIR'] = import_dir
+                sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+                import server
+                print(f"Seeding {proceedings} proceedings...", file=out)
+                cases, seed_stats = seed(server, proceedings, args.proceedings_per_case, args.persons, import_dir)
+                print(f"Seeded {cases} cases in {seed_stats['total']['seconds']}s", file=out)
+                make_client = lambda: InProcessClient(server)
+
+            clients = [make_client() for _ in range(args.users)]
+            samples = []
+            stop_at = time.monotonic() + args.duration
+            threads = [
+                threading.Thread(target=run_user, args=(
+                    user_id, client, Workload(cases, proceedings, args.persons, random.Random(args.random_seed + user_id)),
+                    mix, stop_at, args.timeout, samples
+                ), daemon=True)
+                for user_id, client in enumerate(clients)
+            ]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall_seconds = time.monotonic() - started
+            for client in clients:
+                client.close()
+    finally:
+        shutil.rmtree(import_dir, ignore_errors=True)
+
+    report = summarize(samples, wall_seconds)
+    print_report(report, wall_seconds, out)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'settings': {'proceedings': proceedings, 'users': args.users, 'duration': args.duration,
+                             'mix': mix, 'url': args.url},
+                'seed': seed_stats,
+                'wall_seconds': round(wall_seconds, 3),
+                'queries': report,
+            }, f, indent=2)
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,343 @@
-from flask import Flask, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, jsonify, request, send_file
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from socketio import PubSubManager, RedisManager
 from flask_cors import CORS
 
 import duckdb
+try:
+    import msgpack
+except ImportError:  # optional: enables the 'msgpack' wire format
+    msgpack = None
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional: enables the 'arrow' wire format
+    pyarrow = None
+try:
+    import redis
+except ImportError:  # optional: enables redis:// message queues
+    redis = None
 from datetime import datetime
 import json
+import os
+import base64
+import hashlib
+import tempfile
+import itertools
+import random
+import uuid
+import bisect
+import heapq
+import re
+import contextvars
+from collections import Counter, OrderedDict
+import atexit
+import threading
+from threading import Lock
+import queue
+import time
+import zlib
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+class RawJSON:
+    """JSON text that is already serialized (built by DuckDB with to_json).
+    It is spliced into outgoing packets verbatim by WireJSON, so large results
+    are never parsed into Python objects and re-encoded."""
+    __slots__ = ('text', 'length')
+
+    def __init__(self, text, length):
+        self.text = text
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def value(self):
+        return json.loads(self.text)
+
+    def __repr__(self):
+        return f"<RawJSON {self.length} rows, {len(self.text)} bytes>"
+
+# Size and encode time of the last packet WireJSON encoded on this thread,
+# read back by the query dispatcher for its metrics
+wire_stats = threading.local()
+
+class WireJSON:
+    """json module used by Socket.IO to encode packets; same as json except
+    that RawJSON values are inserted as-is."""
+    loads = staticmethod(json.loads)
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        started = time.perf_counter()
+        text = WireJSON._dumps(obj, **kwargs)
+        wire_stats.encoded_bytes = len(text)
+        wire_stats.encode_seconds = time.perf_counter() - started
+        return text
+
+    @staticmethod
+    def _dumps(obj, **kwargs):
+        raw = []
+        token = uuid.uuid4().hex
+
+        def default(o):
+            if isinstance(o, RawJSON):
+                raw.append(o.text)
+                return f"{token}:{len(raw) - 1}"
+            raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+        text = json.dumps(obj, default=default, **kwargs)
+        if not raw:
+            return text
+        parts = re.split(f'"{token}:(\\d+)"', text)
+        # re.split alternates literal text and captured placeholder indexes
+        return "".join(raw[int(part)] if i % 2 else part for i, part in enumerate(parts))
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all domains
-socketio = SocketIO(app, cors_allowed_origins="*")
 
 
-# Connect to an in-memory DuckDB instance (or to a file by passing a filename)
-con = duckdb.connect(':memory:')
+# Database file location. Set BARANGAY_DB_PATH=:memory: for a throwaway database.
+DB_PATH = os.environ.get('BARANGAY_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'barangay.duckdb'))
+# "bootstrap" runs the (idempotent) schema DDL on every start, "open" trusts an
+# existing file and skips DDL entirely so restarts don't touch the catalog.
+DB_STARTUP_MODE = os.environ.get('BARANGAY_DB_STARTUP_MODE', 'bootstrap')
+# Clients that register with a barangay id get that barangay's own database
+# file under TENANT_DIR; everyone else uses DB_PATH ("default" tenant)
+DEFAULT_TENANT = os.environ.get('BARANGAY_DEFAULT_TENANT', 'default')
+TENANT_DIR = os.environ.get('BARANGAY_TENANT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenants'))
+# Open tenant databases beyond this are closed least-recently-used first, and
+# any tenant idle for TENANT_IDLE_SECONDS is closed by the sweeper
+TENANT_MAX_OPEN = int(os.environ.get('BARANGAY_TENANT_MAX_OPEN', '16'))
+TENANT_IDLE_SECONDS = float(os.environ.get('BARANGAY_TENANT_IDLE_SECONDS', '600'))
+# Seconds between explicit CHECKPOINTs (0 disables the background checkpointer)
+CHECKPOINT_INTERVAL = float(os.environ.get('BARANGAY_CHECKPOINT_INTERVAL', '300'))
+# WAL size at which DuckDB checkpoints on its own
+WAL_AUTOCHECKPOINT = os.environ.get('BARANGAY_WAL_AUTOCHECKPOINT', '64MB')
+# Max number of cursors handed out concurrently, and how long to wait for one
+DB_POOL_SIZE = int(os.environ.get('BARANGAY_DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.environ.get('BARANGAY_DB_POOL_TIMEOUT', '30'))
+# How many IDs each allocator reserves from its sequence per round trip
+ID_BLOCK_SIZE = int(os.environ.get('BARANGAY_ID_BLOCK_SIZE', '64'))
+# Commit window for grouping concurrent mutations into one transaction (0 disables)
+WRITE_BATCH_WINDOW_MS = float(os.environ.get('BARANGAY_WRITE_BATCH_WINDOW_MS', '0'))
+WRITE_BATCH_MAX_SIZE = int(os.environ.get('BARANGAY_WRITE_BATCH_MAX_SIZE', '100'))
+# Number of read results kept by the query result cache (0 disables it)
+RESULT_CACHE_SIZE = int(os.environ.get('BARANGAY_RESULT_CACHE_SIZE', '256'))
+# query_db dispatch: worker threads, max queued + running requests, and the
+# per-request deadline (queue wait included) after which the query is interrupted
+QUERY_WORKERS = int(os.environ.get('BARANGAY_QUERY_WORKERS', str(DB_POOL_SIZE)))
+QUERY_QUEUE_LIMIT = int(os.environ.get('BARANGAY_QUERY_QUEUE_LIMIT', '64'))
+QUERY_TIMEOUT = float(os.environ.get('BARANGAY_QUERY_TIMEOUT', '30'))
+# Attachment file bodies, stored by SHA-256 under ATTACHMENT_DIR/<tenant>/.
+# Uploads are read in ATTACHMENT_CHUNK_BYTES pieces and capped at
+# ATTACHMENT_MAX_BYTES; with BARANGAY_USE_X_SENDFILE set, downloads are
+# handed to the front-end proxy (X-Sendfile) instead of served by Python.
+ATTACHMENT_DIR = os.environ.get('BARANGAY_ATTACHMENT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attachments'))
+ATTACHMENT_MAX_BYTES = int(os.environ.get('BARANGAY_ATTACHMENT_MAX_BYTES', str(100 * 1024 * 1024)))
+ATTACHMENT_CHUNK_BYTES = int(os.environ.get('BARANGAY_ATTACHMENT_CHUNK_BYTES', str(1024 * 1024)))
+USE_X_SENDFILE = os.environ.get('BARANGAY_USE_X_SENDFILE', '') not in ('', '0')
+# Rows per chunk for query_db requests sent with stream: true
+STREAM_CHUNK_ROWS = int(os.environ.get('BARANGAY_STREAM_CHUNK_ROWS', '500'))
+# Most operations one query_batch message may carry
+BATCH_MAX_OPERATIONS = int(os.environ.get('BARANGAY_BATCH_MAX_OPERATIONS', '50'))
+# Fraction of query_db requests logged as a one-line timing summary (all of
+# them are counted in /metrics regardless)
+QUERY_LOG_SAMPLE = float(os.environ.get('BARANGAY_QUERY_LOG_SAMPLE', '0.1'))
+# Running several server processes: they share sessions, rooms and emits
+# through BARANGAY_MESSAGE_QUEUE -- redis://host:port/db (any Redis-protocol
+# server), file:///some/dir (spool directory stand-in for one host) or unset
+# for a single process. DuckDB allows one writing process per file, so each
+# barangay belongs to one worker (crc32(barangay_id) % WORKER_COUNT) and
+# other workers forward its queries there.
+MESSAGE_QUEUE = os.environ.get('BARANGAY_MESSAGE_QUEUE', '')
+WORKER_INDEX = int(os.environ.get('BARANGAY_WORKER_INDEX', '0'))
+WORKER_COUNT = int(os.environ.get('BARANGAY_WORKER_COUNT', '1'))
+SERVER_PORT = int(os.environ.get('BARANGAY_PORT', '5000'))
+# file:// queues: how often each process polls, and how long messages are kept
+SPOOL_POLL_SECONDS = float(os.environ.get('BARANGAY_SPOOL_POLL_SECONDS', '0.02'))
+SPOOL_RETENTION_SECONDS = float(os.environ.get('BARANGAY_SPOOL_RETENTION_SECONDS', '60'))
+
+class LocalBus:
+    """Single-process message bus: publish() calls this process's subscribers."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+class SpoolBus:
+    """Stand-in for Redis pub/sub between processes on one host, for tests and
+    development: each message is a JSON file in <directory>/<channel>/ and
+    every process polls the channels it subscribed to. Messages are encoded
+    with WireJSON so RawJSON results go out as-is; Socket.IO has already
+    base64-encoded any binary attachments. Files older than ``retention``
+    seconds are removed by whichever process sees them first.
+    """
 
-# Execute the SQL commands to create tables
-con.execute('''
-CREATE TABLE roles (
+    def __init__(self, directory, poll_interval=SPOOL_POLL_SECONDS, retention=SPOOL_RETENTION_SECONDS):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._subscribers = {}
+        self._seen = {}  # channel -> {file name: timestamp ns}
+        self._counter = itertools.count()
+        self._started_ns = time.time_ns()
+        self._lock = Lock()
+        self._thread = None
+
+    def publish(self, channel, message):
+        path = os.path.join(self.directory, channel)
+        os.makedirs(path, exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self._counter)}.msg"
+        # Written under a dot name and renamed, so readers never see half a message
+        tmp_path = os.path.join(path, '.' + name)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(WireJSON._dumps(message))
+        os.replace(tmp_path, os.path.join(path, name))
+
+    def subscribe(self, channel, callback):
+        os.makedirs(os.path.join(self.directory, channel), exist_ok=True)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                channels = {channel: list(callbacks) for channel, callbacks in self._subscribers.items()}
+            for channel, callbacks in channels.items():
+                self._poll(channel, callbacks)
+            time.sleep(self.poll_interval)
+
+    def _poll(self, channel, callbacks):
+        path = os.path.join(self.directory, channel)
+        seen = self._seen.setdefault(channel, {})
+        cutoff = time.time_ns() - int(self.retention * 1e9)
+        # Names start with the publish time, so sorting replays them in order.
+        # Already-seen names are tracked rather than a high-water mark because
+        # a message can land after a later-stamped one from another process.
+        for name in sorted(os.listdir(path)):
+            if name.startswith('.') or name in seen:
+                continue
+            stamp = int(name.split('-', 1)[0])
+            seen[name] = stamp
+            if stamp < self._started_ns or stamp < cutoff:
+                continue
+            try:
+                with open(os.path.join(path, name), encoding='utf-8') as f:
+                    message = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            for callback in callbacks:
+                try:
+                    callback(message)
+                except Exception as e:
+                    print("Message handler on", channel, "failed:", repr(e))
+        for name, stamp in list(seen.items()):
+            if stamp < cutoff:
+                del seen[name]
+                try:
+                    os.unlink(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+class RedisBus:
+    """Pub/sub over a Redis-protocol server (Redis, Valkey, KeyDB, ...).
+    Messages are WireJSON-encoded, like SpoolBus files."""
+
+    def __init__(self, url, prefix='barangay'):
+        if redis is None:
+            raise RuntimeError("A redis:// message queue needs the redis package")
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._lock = Lock()
+        self._thread = None
+
+    def publish(self, channel, message):
+        self.redis.publish(f"{self.prefix}:{channel}", WireJSON._dumps(message))
+
+    def subscribe(self, channel, callback):
+        def handle(item):
+            callback(json.loads(item['data']))
+        with self._lock:
+            self._pubsub.subscribe(**{f"{self.prefix}:{channel}": handle})
+            if self._thread is None:
+                self._thread = self._pubsub.run_in_thread(sleep_time=0.01, daemon=True)
+
+class BusManager(PubSubManager):
+    """Socket.IO client manager that shares rooms and emits over a SpoolBus,
+    the way RedisManager does over Redis."""
+    name = 'bus'
+
+    def __init__(self, bus, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus
+        self._inbox = queue.Queue()
+
+    def initialize(self):
+        if not self.write_only:
+            self.bus.subscribe(self.channel, self._inbox.put)
+        super().initialize()
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+def make_message_bus(url):
+    if not url or url.startswith('memory://'):
+        return LocalBus()
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBus(url)
+    if url.startswith('file://'):
+        return SpoolBus(url[len('file://'):])
+    raise ValueError(f"Unsupported BARANGAY_MESSAGE_QUEUE: {url}")
+
+message_bus = make_message_bus(MESSAGE_QUEUE)
+if isinstance(message_bus, RedisBus):
+    socketio_queue = {'client_manager': RedisManager(MESSAGE_QUEUE, channel='barangay-socketio')}
+elif isinstance(message_bus, SpoolBus):
+    socketio_queue = {'client_manager': BusManager(message_bus, channel='socketio')}
+else:
+    socketio_queue = {}
+socketio = SocketIO(app, cors_allowed_origins="*", json=WireJSON, **socketio_queue)
+
+def tenant_owner(name):
+    return zlib.crc32(name.encode()) % WORKER_COUNT
+
+def owns_tenant(name):
+    return tenant_owner(name) == WORKER_INDEX
+
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS roles (
     role_id INTEGER PRIMARY KEY,
     role_name VARCHAR,
     description TEXT
 );
 
-CREATE TABLE persons (
+CREATE TABLE IF NOT EXISTS persons (
     person_id VARCHAR PRIMARY KEY,
     name VARCHAR,
     role_id INTEGER REFERENCES roles(role_id)
 );
 
-CREATE TABLE cases (
+CREATE TABLE IF NOT EXISTS cases (
     case_id INTEGER PRIMARY KEY,
     title VARCHAR,
     description TEXT,
@@ -44,7 +353,7 @@ CREATE TABLE cases (
     closed_by VARCHAR REFERENCES persons(person_id)
 );
 
-CREATE TABLE persons_info (
+CREATE TABLE IF NOT EXISTS persons_info (
     person_id VARCHAR REFERENCES persons(person_id), -- Corrected foreign key reference
     role TEXT,
     first_name VARCHAR,
@@ -56,7 +365,7 @@ CREATE TABLE persons_info (
 );
 
 
-CREATE TABLE schedules (
+CREATE TABLE IF NOT EXISTS schedules (
     schedule_id VARCHAR PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     person_id VARCHAR REFERENCES persons(person_id),
@@ -66,7 +375,7 @@ CREATE TABLE schedules (
     status TEXT
 );
 
-CREATE TABLE proceedings (
+CREATE TABLE IF NOT EXISTS proceedings (
     proceeding_id BIGINT PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     start_time TIMESTAMP,
@@ -80,7 +389,7 @@ CREATE TABLE proceedings (
     status VARCHAR
 );
 
-CREATE TABLE proceeding_participants (
+CREATE TABLE IF NOT EXISTS proceeding_participants (
     proceeding_id BIGINT REFERENCES proceedings(proceeding_id),
     person_id VARCHAR,
     name VARCHAR,
@@ -88,49 +397,757 @@ CREATE TABLE proceeding_participants (
     PRIMARY KEY (proceeding_id, person_id)
 );
 
-CREATE TABLE proceeding_schedules (
+CREATE TABLE IF NOT EXISTS proceeding_schedules (
     proceeding_id BIGINT REFERENCES proceedings(proceeding_id),
     schedule_id VARCHAR REFERENCES schedules(schedule_id),
     PRIMARY KEY (proceeding_id, schedule_id)
 );
 
-CREATE TABLE resolutions (
+-- File metadata only; bodies are on disk, named by sha256 (see store_attachment)
+CREATE TABLE IF NOT EXISTS attachments (
+    attachment_id BIGINT PRIMARY KEY,
+    case_id INTEGER REFERENCES cases(case_id),
+    proceeding_id BIGINT REFERENCES proceedings(proceeding_id),
+    sha256 VARCHAR NOT NULL,
+    filename VARCHAR,
+    content_type VARCHAR,
+    size BIGINT,
+    uploaded_by VARCHAR,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS resolutions (
     resolution_id INTEGER PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     title VARCHAR,
     content TEXT,
     resolved_at TIMESTAMP
 );
-''')
 
-print("Tables created successfully.")
-def get_next_id(con, table_name, id_column):
-    result = con.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table_name}").fetchone()
-    return result[0]
+-- Full-text search: an inverted index over proceedings (summary, content)
+-- and cases (title, description), maintained by the write paths
+CREATE TABLE IF NOT EXISTS search_documents (
+    doc_type VARCHAR,
+    doc_id BIGINT,
+    case_id INTEGER,
+    length INTEGER
+);
 
-# Example: Insert into cases
-def create_case(data):
-    case_id = get_next_id(con, "cases", "case_id")
+CREATE TABLE IF NOT EXISTS search_postings (
+    term VARCHAR,
+    doc_type VARCHAR,
+    doc_id BIGINT,
+    tf INTEGER
+);
+
+-- Dashboard rollups, refreshed from the base tables for the keys each write
+-- touched (see RollupMaintainer). Unknown priority or status is stored as ''.
+CREATE TABLE IF NOT EXISTS rollup_case_month (
+    case_id INTEGER,
+    month DATE,
+    proceedings BIGINT,
+    PRIMARY KEY (case_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_case_status (
+    priority VARCHAR,
+    status VARCHAR,
+    cases BIGINT,
+    PRIMARY KEY (priority, status)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_case_resolution (
+    priority VARCHAR PRIMARY KEY,
+    resolved_cases BIGINT,
+    resolution_seconds DOUBLE
+);
+
+-- One row: clean is true only while the rollups above are known to match the
+-- base tables (written on clean shutdown, cleared on open)
+CREATE TABLE IF NOT EXISTS rollup_state (
+    clean BOOLEAN
+);
+'''
+
+# Secondary indexes, by name: (table, columns). Kept out of SCHEMA_SQL so they
+# are checked on every start (ensure_indexes), "open" mode included.
+SECONDARY_INDEXES = {
+    # Case views and cascading deletes
+    'proceedings_case_idx': ('proceedings', 'case_id'),
+    'proceeding_participants_proceeding_idx': ('proceeding_participants', 'proceeding_id'),
+    'proceeding_schedules_proceeding_idx': ('proceeding_schedules', 'proceeding_id'),
+    'schedules_case_idx': ('schedules', 'case_id'),
+    'attachments_case_idx': ('attachments', 'case_id'),
+    'attachments_proceeding_idx': ('attachments', 'proceeding_id'),
+    # Orphan checks when an attachment goes away
+    'attachments_sha256_idx': ('attachments', 'sha256'),
+    # Timeline lookups: schedules for a set of people. DuckDB only scans an
+    # index for =/IN on a single column, so start_time is filtered afterwards
+    'schedules_person_idx': ('schedules', 'person_id'),
+    # Full-text search
+    'search_documents_doc_idx': ('search_documents', 'doc_type, doc_id'),
+    'search_postings_term_idx': ('search_postings', 'term'),
+    'search_postings_doc_idx': ('search_postings', 'doc_type, doc_id'),
+}
+
+# Indexes earlier versions created that nothing uses any more
+RETIRED_INDEXES = ('schedules_person_start_idx',)
+
+def ensure_indexes(con):
+    existing = {row[0] for row in con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+    for index_name in RETIRED_INDEXES:
+        if index_name in existing:
+            con.execute(f"DROP INDEX {index_name}")
+            print("Dropped index", index_name)
+    for index_name, (table_name, columns) in SECONDARY_INDEXES.items():
+        if index_name not in existing:
+            con.execute(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
+            print("Created index", index_name)
+
+def schema_exists(con):
+    # Every table in SCHEMA_SQL must be there, so "open" mode never skips DDL
+    # for a file created before a table was added
+    expected = set(re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", SCHEMA_SQL))
+    existing = {row[0] for row in con.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = 'main'
+    """).fetchall()}
+    return expected <= existing
+
+# sequence name -> (table, id column) it hands out IDs for
+ID_SEQUENCES = {
+    'case_id_seq': ('cases', 'case_id'),
+    'proceeding_id_seq': ('proceedings', 'proceeding_id'),
+    'schedule_id_seq': ('schedules', 'schedule_id'),
+    'attachment_id_seq': ('attachments', 'attachment_id'),
+}
+
+def ensure_sequences(con):
+    existing = {row[0] for row in con.execute("SELECT sequence_name FROM duckdb_sequences()").fetchall()}
+    for sequence_name, (table_name, id_column) in ID_SEQUENCES.items():
+        if sequence_name in existing:
+            continue
+        # Start past any rows written before the sequence existed. This is the
+        # only MAX() scan left and it runs once per database, not per insert.
+        start = con.execute(
+            f"SELECT COALESCE(MAX(TRY_CAST({id_column} AS BIGINT)), 0) + 1 FROM {table_name}"
+        ).fetchone()[0]
+        con.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence_name} START {start}")
+
+# Tokens are maximal runs of letters/digits, lowercased; single characters are dropped
+SEARCH_TOKEN_SPLIT = r'[^\p{L}\p{N}]+'
+# The same tokens in Python, for indexing one document: compiling the Unicode
+# classes above costs DuckDB a few ms per statement, more than the indexing
+SEARCH_TOKEN = re.compile(r'[^\W_]+')
+
+# doc_type -> (table, id column, case_id column, searchable text expression)
+SEARCH_SOURCES = {
+    'proceeding': ('proceedings', 'proceeding_id', 'case_id', "concat_ws(' ', summary, content)"),
+    'case': ('cases', 'case_id', 'case_id', "concat_ws(' ', title, description)"),
+}
+
+def remove_from_search(con, doc_type, ids=None):
+    if ids is None:
+        con.execute("DELETE FROM search_postings WHERE doc_type = ?", (doc_type,))
+        con.execute("DELETE FROM search_documents WHERE doc_type = ?", (doc_type,))
+        return
+    # One equality delete per document: unlike list_contains, doc_id = ? is
+    # pushed into the scan and skips row groups by their min/max
+    for doc_id in ids:
+        con.execute("DELETE FROM search_postings WHERE doc_type = ? AND doc_id = ?", (doc_type, doc_id))
+        con.execute("DELETE FROM search_documents WHERE doc_type = ? AND doc_id = ?", (doc_type, doc_id))
+
+def reindex_search(con, doc_type, ids=None, missing_only=False):
+    """(Re)build search entries for ``doc_type`` from its source table: the
+    rows in ``ids``, only rows not indexed yet (``missing_only``), or all rows.
+    Tokenizing and counting happen in DuckDB, so indexing a bulk import is a
+    couple of set-based statements."""
+    table_name, id_column, case_column, text = SEARCH_SOURCES[doc_type]
+    if ids is not None:
+        ids = [int(doc_id) for doc_id in ids]
+        remove_from_search(con, doc_type, ids)
+        for doc_id in ids:
+            index_document(con, doc_type, doc_id)
+        return
+    if missing_only:
+        doc_filter = f"t.{id_column} NOT IN (SELECT doc_id FROM search_documents WHERE doc_type = ?)"
+        filter_params = (doc_type,)
+    else:
+        remove_from_search(con, doc_type)
+        doc_filter, filter_params = "TRUE", ()
+    index_documents(con, doc_type, doc_filter, filter_params)
+
+def index_document(con, doc_type, doc_id):
+    table_name, id_column, case_column, text = SEARCH_SOURCES[doc_type]
+    row = con.execute(f"SELECT {case_column}, {text} FROM {table_name} WHERE {id_column} = ?", (doc_id,)).fetchone()
+    if row is None:
+        return
+    counts = Counter(term for term in SEARCH_TOKEN.findall(row[1].lower()) if len(term) > 1)
+    if counts:
+        con.execute("""
+            INSERT INTO search_postings (term, doc_type, doc_id, tf)
+            SELECT unnest(?), ?, ?, unnest(?)
+        """, (list(counts), doc_type, doc_id, list(counts.values())))
+    con.execute(
+        "INSERT INTO search_documents (doc_type, doc_id, case_id, length) VALUES (?, ?, ?, ?)",
+        (doc_type, doc_id, row[0], sum(counts.values()))
+    )
+
+def index_documents(con, doc_type, doc_filter, filter_params):
+    # Postings go in first: a missing_only filter still sees these rows as
+    # unindexed until search_documents gets them
+    table_name, id_column, case_column, text = SEARCH_SOURCES[doc_type]
+    con.execute(f"""
+        INSERT INTO search_postings (term, doc_type, doc_id, tf)
+        SELECT term, ?, doc_id, COUNT(*)
+        FROM (
+            SELECT t.{id_column} AS doc_id, unnest(regexp_split_to_array(lower({text}), ?)) AS term
+            FROM {table_name} t
+            WHERE {doc_filter}
+        )
+        WHERE length(term) > 1
+        GROUP BY term, doc_id
+    """, (doc_type, SEARCH_TOKEN_SPLIT) + tuple(filter_params))
+    con.execute(f"""
+        INSERT INTO search_documents (doc_type, doc_id, case_id, length)
+        SELECT ?, t.{id_column}, t.{case_column},
+               len(list_filter(regexp_split_to_array(lower({text}), ?), term -> length(term) > 1))
+        FROM {table_name} t
+        WHERE {doc_filter}
+    """, (doc_type, SEARCH_TOKEN_SPLIT) + tuple(filter_params))
+
+def refresh_rollups(con, case_ids=None, priorities=None):
+    """Recompute rollup rows from the base tables: proceedings per month for
+    ``case_ids``, case status and resolution rollups for ``priorities``, or
+    everything when neither is given."""
+    # Key filters are IN lists on the bare columns so DuckDB pushes them into
+    # the scan; list_contains(?, col) or a wrapped column is filtered row by
+    # row after a full scan
+    full = case_ids is None and priorities is None
+    if full or case_ids:
+        # Case IDs are inlined as integer literals: binding costs ~0.1ms per
+        # parameter, which dominated flushes after bulk writes
+        where = "TRUE" if full else f"case_id IN ({', '.join(str(int(case_id)) for case_id in case_ids)})"
+        con.execute(f"DELETE FROM rollup_case_month WHERE {where}")
+        con.execute(f"""
+            INSERT INTO rollup_case_month (case_id, month, proceedings)
+            SELECT case_id, CAST(date_trunc('month', start_time) AS DATE), COUNT(*)
+            FROM proceedings
+            WHERE {where} AND case_id IS NOT NULL AND start_time IS NOT NULL
+            GROUP BY ALL
+        """)
+    if full or priorities:
+        if full:
+            where, params = "TRUE", []
+        else:
+            # Rollups key NULL priorities as ''
+            params = [priority for priority in priorities if priority]
+            where = f"priority IN ({', '.join('?' for _ in params)})" if params else "FALSE"
+            if '' in priorities:
+                where = f"({where} OR priority IS NULL OR priority = '')"
+        for table_name in ('rollup_case_status', 'rollup_case_resolution'):
+            con.execute(f"DELETE FROM {table_name} WHERE {where}", params)
+        con.execute(f"""
+            INSERT INTO rollup_case_status (priority, status, cases)
+            SELECT COALESCE(priority, ''), COALESCE(status, ''), COUNT(*)
+            FROM cases WHERE {where}
+            GROUP BY ALL
+        """, params)
+        con.execute(f"""
+            INSERT INTO rollup_case_resolution (priority, resolved_cases, resolution_seconds)
+            SELECT COALESCE(priority, ''), COUNT(*), SUM(epoch(resolved_at - created_at))
+            FROM cases WHERE {where} AND resolved_at IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY ALL
+        """, params)
+
+def rollups_clean(con):
+    row = con.execute("SELECT clean FROM rollup_state").fetchone()
+    return bool(row and row[0])
+
+def set_rollups_clean(con, clean):
+    con.execute("DELETE FROM rollup_state")
+    con.execute("INSERT INTO rollup_state (clean) VALUES (?)", (clean,))
+
+class RollupMaintainer:
+    """Keeps the rollup tables in step with the base tables.
+
+    Write paths only mark the keys they touched (case IDs, priorities) once
+    their transaction commits; flush() recomputes just those keys. Rollup rows
+    are shared by many writers (every new case lands in one status row), so
+    they get a single writer here instead of conflicting updates from each
+    write transaction. Readers flush before reading.
+    """
+
+    def __init__(self):
+        self._lock = Lock()        # guards the dirty sets
+        self._flush_lock = Lock()  # one flush at a time
+        self._case_ids = set()
+        self._priorities = set()
+        self._full = False
+
+    def mark(self, con, case_ids=(), priorities=()):
+        case_ids = {case_id for case_id in case_ids if case_id is not None}
+        priorities = {priority or '' for priority in priorities}
+        after_commit(con, lambda: self._add(case_ids, priorities))
+
+    def mark_all(self, con):
+        after_commit(con, lambda: self._add(full=True))
+
+    def _add(self, case_ids=(), priorities=(), full=False):
+        with self._lock:
+            self._case_ids.update(case_ids)
+            self._priorities.update(priorities)
+            self._full = self._full or full
+
+    def flush(self, con):
+        with self._flush_lock:
+            with self._lock:
+                case_ids, priorities, full = self._case_ids, self._priorities, self._full
+                self._case_ids, self._priorities, self._full = set(), set(), False
+            if not (case_ids or priorities or full):
+                return
+            # Inside an outer transaction (a transactional query_batch) the
+            # rewrite is undone with it, so the keys must stay dirty
+            after_rollback(con, lambda: self._add(case_ids, priorities, full))
+            try:
+                with transaction(con):
+                    if full:
+                        refresh_rollups(con)
+                    else:
+                        refresh_rollups(con, case_ids, priorities)
+            except Exception:
+                self._add(case_ids, priorities, full)
+                raise
+
+rollups = RollupMaintainer()
+
+def ensure_search_index(con):
+    # Databases created before search existed (or rows written behind the
+    # server's back) get indexed on startup
+    for doc_type in SEARCH_SOURCES:
+        reindex_search(con, doc_type, missing_only=True)
+
+def backfill_people_counts(con):
+    # proceedings.people_count lets list views skip proceeding_participants;
+    # fill it in for rows inserted without one (imports, older databases)
     con.execute("""
-        INSERT INTO cases (
-            case_id, title, description, priority, status,
-            created_by, assigned_to, resolved_by, closed_by,
-            resolved_at, closed_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        case_id,
-        data['title'],
-        data['description'],
-        data['priority'],
-        data['status'],
-        None,  # created_by
-        None,  # assigned_to
-        None,  # resolved_by
-        None,  # closed_by
-        None,  # resolved_at
-        None   # closed_at
-    ))
+        UPDATE proceedings p
+        SET people_count = c.n
+        FROM (
+            SELECT proceeding_id, COUNT(*) AS n
+            FROM proceeding_participants
+            WHERE proceeding_id IN (SELECT proceeding_id FROM proceedings WHERE people_count IS NULL)
+            GROUP BY proceeding_id
+        ) c
+        WHERE p.proceeding_id = c.proceeding_id
+    """)
+
+def open_database(path=DB_PATH, startup_mode=DB_STARTUP_MODE):
+    existing_file = path != ':memory:' and os.path.exists(path)
+    con = duckdb.connect(path)
+    con.execute(f"SET checkpoint_threshold = '{WAL_AUTOCHECKPOINT}'")
+
+    if startup_mode == 'open' and existing_file and schema_exists(con):
+        print("Opened existing database:", path)
+    else:
+        # Execute the SQL commands to create tables
+        con.execute(SCHEMA_SQL)
+        print("Tables created successfully.")
+    ensure_sequences(con)
+    ensure_indexes(con)
+    ensure_search_index(con)
+    # Rows may have been written behind the server's back
+    backfill_people_counts(con)
+    # Rollups are stored, so only a new file, one from before rollup_state, or
+    # one whose server died with unflushed marks needs the full recompute.
+    # (After editing base tables by hand, set rollup_state.clean to false.)
+    if not rollups_clean(con):
+        refresh_rollups(con)
+    set_rollups_clean(con, False)
+    return con
+
+def checkpoint(con):
+    # Folds the WAL into the main database file so the next start replays nothing
+    con.execute("CHECKPOINT")
+
+def run_checkpoints(con, interval=CHECKPOINT_INTERVAL, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    # Own cursor so checkpoints never share result state with request handlers
+    cur = con.cursor()
+    while not stop_event.wait(interval):
+        try:
+            checkpoint(cur)
+        except duckdb.Error as e:
+            print("Checkpoint failed:", e)
+    cur.close()
+
+def start_checkpointer(con, interval=CHECKPOINT_INTERVAL):
+    if interval <= 0 or DB_PATH == ':memory:':
+        return None
+    stop_event = threading.Event()
+    thread = threading.Thread(target=run_checkpoints, args=(con, interval, stop_event), daemon=True)
+    thread.start()
+    return stop_event
+
+class PoolTimeout(Exception):
+    pass
+
+class CursorPool:
+    """Bounded pool of DuckDB cursors (one per in-flight task) over a single database.
+
+    Each cursor is an independent connection to the same database, so concurrent
+    handlers get their own result sets instead of trampling a shared ``con``.
+    """
+
+    def __init__(self, con, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.con = con
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "max_in_use": 0,
+        }
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["waits"] += 1
+            if not self._slots.acquire(timeout=timeout):
+                with self._lock:
+                    self._metrics["timeouts"] += 1
+                raise PoolTimeout(f"No database cursor available after {timeout}s")
+        waited = time.perf_counter() - started
+
+        try:
+            cur = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                cur = self.con.cursor()
+            except BaseException:
+                self._slots.release()
+                raise
+            with self._lock:
+                self._created += 1
+
+        with self._lock:
+            self._in_use += 1
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_time_total"] += waited
+            self._metrics["max_in_use"] = max(self._metrics["max_in_use"], self._in_use)
+        return cur
+
+    def release(self, cur):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(cur)
+        self._slots.release()
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        cur = self.acquire(timeout)
+        try:
+            yield cur
+        finally:
+            self.release(cur)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                **self._metrics,
+            }
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# A worker that doesn't own the default tenant must not lock its file; it
+# gets an empty in-memory stand-in that the registry never hands out
+con = open_database() if owns_tenant(DEFAULT_TENANT) else open_database(':memory:')
+db_pool = CursorPool(con)
+
+@atexit.register
+def close_database():
+    try:
+        rollups.flush(con)
+        set_rollups_clean(con, True)
+        db_pool.close()
+        if DB_PATH != ':memory:':
+            checkpoint(con)
+        con.close()
+    except duckdb.Error:
+        pass
+
+class IdAllocator:
+    """Hands out IDs from a DuckDB sequence, reserving them a block at a time.
+
+    Each refill pulls ``block_size`` values with a single nextval() query, so
+    most inserts get their ID without touching the database at all. IDs are
+    unique across threads; unused reservations simply leave gaps.
+    """
+
+    def __init__(self, sequence_name, block_size=ID_BLOCK_SIZE):
+        if sequence_name not in ID_SEQUENCES:
+            raise ValueError(f"Unknown sequence: {sequence_name}")
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def next_id(self, con):
+        with self._lock:
+            if not self._ids:
+                rows = con.execute(
+                    f"SELECT nextval('{self.sequence_name}') FROM range({self.block_size})"
+                ).fetchall()
+                # Pop from the end, so keep the block in descending order
+                self._ids = sorted((row[0] for row in rows), reverse=True)
+            return self._ids.pop()
+
+    def reset(self):
+        # Drop reserved IDs, e.g. after the sequence was moved past imported rows
+        with self._lock:
+            self._ids = []
+
+case_ids = IdAllocator('case_id_seq')
+proceeding_ids = IdAllocator('proceeding_id_seq')
+schedule_ids = IdAllocator('schedule_id_seq')
+
+# The tenant whose database the current request runs against; unset means
+# the default tenant (module-level con, db_pool, allocators, ...)
+_current_tenant = contextvars.ContextVar('tenant', default=None)
+
+def current_tenant():
+    return _current_tenant.get() or default_tenant
+
+def get_next_id(con, table_name, id_column):
+    # Kept for callers outside this module; backed by the sequence allocators now
+    tenant = current_tenant()
+    for allocator in (tenant.case_ids, tenant.proceeding_ids, tenant.schedule_ids):
+        if ID_SEQUENCES[allocator.sequence_name] == (table_name, id_column):
+            return allocator.next_id(con)
+    raise ValueError(f"No ID sequence for {table_name}.{id_column}")
+
+# Cursors that currently have an open transaction, so nested
+# transaction() blocks (e.g. inside a write batch) join the outer one
+_open_transactions = set()
+# Callbacks waiting for their transaction to commit (or roll back), keyed
+# like _open_transactions
+_after_commit = {}
+_after_rollback = {}
+
+def after_commit(con, callback):
+    # Run now outside a transaction; otherwise once it commits (never on rollback)
+    if id(con) in _open_transactions:
+        _after_commit.setdefault(id(con), []).append(callback)
+    else:
+        callback()
+
+def after_rollback(con, callback):
+    # Run if the open transaction rolls back; outside one there is nothing to undo
+    if id(con) in _open_transactions:
+        _after_rollback.setdefault(id(con), []).append(callback)
+
+# Socket.IO rooms for the change feed: every case list viewer, and one per
+# case, both scoped to the tenant so barangays never see each other's changes
+def cases_room(tenant_name=None):
+    return f"{tenant_name or current_tenant().name}:cases"
+
+def case_room(case_id, tenant_name=None):
+    return f"{tenant_name or current_tenant().name}:case:{case_id}"
+
+_change_versions = itertools.count(1)
+_change_version_lock = Lock()
+
+def iso(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def emit_change(room, change):
+    with _change_version_lock:
+        change['version'] = next(_change_versions)
+    # ``room`` may be a list; a client in several of them gets the event once
+    socketio.emit('change', change, to=room)
+
+def publish_change(con, room, entity, entity_id, op, fields=None):
+    """Publish a compact delta ({entity, id, op, fields, version}) to ``room``.
+
+    Inside a transaction the event is held until commit and dropped on
+    rollback, so subscribers never see writes that didn't happen.
+    """
+    change = {'entity': entity, 'id': entity_id, 'op': op, 'fields': fields or {}}
+    after_commit(con, lambda: emit_change(room, change))
+
+@contextmanager
+def transaction(con):
+    if id(con) in _open_transactions:
+        yield con
+        return
 
+    con.begin()
+    _open_transactions.add(id(con))
+    try:
+        yield con
+        con.commit()
+    except BaseException:
+        con.rollback()
+        _after_commit.pop(id(con), None)
+        _open_transactions.discard(id(con))
+        for callback in _after_rollback.pop(id(con), []):
+            callback()
+        raise
+    finally:
+        _open_transactions.discard(id(con))
+
+    _after_rollback.pop(id(con), None)
+    for callback in _after_commit.pop(id(con), []):
+        callback()
+
+class ResultCache:
+    """LRU cache of read-handler payloads keyed by query_id + parameters.
+
+    Entries carry tags ((tenant, 'cases'), (tenant, ('proceedings', case_id)))
+    and are dropped when a write invalidates one of their tags, or all of a
+    tenant's at once. Each tag and each tenant has a generation number so a
+    read that raced with a write never stores its (possibly stale) result.
+    Cached payloads are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._tag_keys = {}
+        self._generations = {}
+        self._tenant_generations = {}
+        self._lock = Lock()
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(query_id, data):
+        return (query_id, json.dumps(data, sort_keys=True, default=str))
+
+    def get_or_load(self, key, tags, load):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._metrics["hits"] += 1
+                return self._entries[key][0]
+            self._metrics["misses"] += 1
+            generations = [self._generation(tag) for tag in tags]
+
+        value = load()
+
+        with self._lock:
+            if self.max_size <= 0:
+                return value
+            if generations != [self._generation(tag) for tag in tags]:
+                return value
+            self._entries[key] = (value, tags)
+            self._entries.move_to_end(key)
+            for tag in tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._metrics["evictions"] += 1
+        return value
+
+    def _generation(self, tag):
+        tenant_name = tag[0]
+        return self._generations.get(tag, 0), self._tenant_generations.get(tenant_name, 0)
+
+    def _drop(self, key):
+        _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tag_keys.get(tag, ())):
+                    self._drop(key)
+                    self._metrics["invalidations"] += 1
+
+    def invalidate_tenant(self, tenant_name):
+        # Every entry of one tenant, for writes too broad to name by tag
+        with self._lock:
+            self._tenant_generations[tenant_name] = self._tenant_generations.get(tenant_name, 0) + 1
+            for tag in [tag for tag in self._tag_keys if tag[0] == tenant_name]:
+                for key in list(self._tag_keys.get(tag, ())):
+                    self._drop(key)
+                    self._metrics["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, **self._metrics}
+
+result_cache = ResultCache()
+
+def tenant_tags(*tags):
+    # Cache keys and tags are per tenant: the same case_id means different
+    # rows in different barangays
+    name = current_tenant().name
+    return [(name, tag) for tag in tags]
+
+def proceedings_tag(case_id):
+    # Clients send case ids as numbers or strings; tag by the stored INTEGER so
+    # a write with "1" invalidates reads made with 1
+    try:
+        return ('proceedings', int(case_id))
+    except (TypeError, ValueError):
+        return ('proceedings', case_id)
+
+def invalidate_cached(con, *tags):
+    # Drop cached reads once the write is visible to other cursors
+    tags = tenant_tags(*tags)
+    after_commit(con, lambda: result_cache.invalidate(*tags))
+
+def cached_query(query_id, handler, tags_for):
+    """Wrap a read handler in the result cache; ``tags_for(data)`` names the
+    data the result depends on."""
+    def cached_handler(con, data=None):
+        return result_cache.get_or_load(
+            ResultCache.make_key((current_tenant().name, query_id), data),
+            tenant_tags(*tags_for(data or {})),
+            lambda: handler(con, data)
+        )
+    cached_handler.__name__ = handler.__name__
+    cached_handler.uncached = handler
+    return cached_handler
+
+def insert_rows(con, table_name, columns, rows):
+    # One multi-row INSERT instead of a statement per row
+    if not rows:
+        return
+    placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+    con.execute(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES "
+        + ", ".join(placeholders for _ in rows),
+        [value for row in rows for value in row]
+    )
+
+# Example: Insert into cases
+def create_case(con, data):
+    case_id = current_tenant().case_ids.next_id(con)
     created_case = {
         "status": data["status"],
         "case_id": case_id,
@@ -139,7 +1156,32 @@ def create_case(data):
         "priority": data["priority"]
     }
 
-    print("Created case ID:", created_case)
+    with transaction(con):
+        con.execute("""
+            INSERT INTO cases (
+                case_id, title, description, priority, status,
+                created_by, assigned_to, resolved_by, closed_by,
+                resolved_at, closed_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            case_id,
+            data['title'],
+            data['description'],
+            data['priority'],
+            data['status'],
+            None,  # created_by
+            None,  # assigned_to
+            None,  # resolved_by
+            None,  # closed_by
+            None,  # resolved_at
+            None   # closed_at
+        ))
+        current_tenant().rollups.mark(con, priorities=[data['priority']])
+
+        reindex_search(con, 'case', [case_id])
+        invalidate_cached(con, 'cases')
+        publish_change(con, cases_room(), 'case', case_id, 'created', created_case)
+    print("Created case ID:", case_id)
     return created_case
 
 from datetime import datetime, date
@@ -176,176 +1218,453 @@ def normalize_timestamp(value, _date=None):
         return None
 
             
-def ensure_case_exists(case_id):
+def ensure_case_exists(con, case_id):
     if not con.execute("SELECT 1 FROM cases WHERE case_id = ?", (case_id,)).fetchone():
         raise ValueError(f"Invalid case_id: {case_id}")
 
-def generate_schedule_id(person_id, timestamp):
-    ts = normalize_timestamp(timestamp)
-    ts_str = ts.strftime("%Y%m%d%H%M%S%f") if ts else "00000000000000"
-    return f"{person_id}_{ts_str}"
+class ScheduleConflict(ValueError):
+    pass
 
-def create_proceeding(data):
-    ensure_case_exists(data.get('caseId'))
-    con.execute("""
-        INSERT INTO proceedings (
-            proceeding_id, case_id, start_time, end_time, summary, content, people_count, date_created, date_updated, status
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        data.get('id', None),
-        data.get('caseId', None),
-        normalize_timestamp(data.get('startTime'), data.get('date')),
-        normalize_timestamp(data.get('endTime'), data.get('date')),
-        data.get('summary', None),
-        data.get('content', None),
-        len(data.get("participants", []) or []),
-        normalize_timestamp(None, data.get('dateCreated')),
-        normalize_timestamp(None, data.get('dateUpdated')),
-        data.get('status', None)
-    ))
+class ScheduleIndex:
+    """In-memory copy of ``schedules`` sorted by (person_id, start_time).
 
+    Overlap checks bisect to the first schedule starting at or after the
+    proposed end and walk back only as far as the person's longest schedule
+    could reach, so a lookup touches a handful of entries instead of a table.
+    Kept in sync by the write paths after their transactions commit.
+    """
+
+    def __init__(self):
+        self._starts = {}      # person_id -> sorted start times
+        self._entries = {}     # person_id -> entries aligned with _starts
+        self._max_length = {}  # person_id -> longest (end - start) seen
+        self._by_id = {}       # schedule_id -> (person_id, entry)
+        self._by_case = {}     # case_id -> schedule_ids
+        self._lock = Lock()
+
+    def load(self, con):
+        rows = con.execute("""
+            SELECT schedule_id, person_id, start_time, end_time, case_id
+            FROM schedules
+            WHERE person_id IS NOT NULL AND start_time IS NOT NULL
+            ORDER BY person_id, start_time
+        """).fetchall()
+        with self._lock:
+            self.__init__()
+            for row in rows:
+                self._add(*row)
+
+    def _add(self, schedule_id, person_id, start_time, end_time, case_id):
+        # Missing or inverted end times count as a point in time
+        end_time = max(end_time or start_time, start_time)
+        entry = (start_time, end_time, schedule_id, case_id)
+        starts = self._starts.setdefault(person_id, [])
+        entries = self._entries.setdefault(person_id, [])
+        index = bisect.bisect_right(starts, start_time)
+        starts.insert(index, start_time)
+        entries.insert(index, entry)
+        self._max_length[person_id] = max(self._max_length.get(person_id, end_time - start_time),
+                                          end_time - start_time)
+        self._by_id[schedule_id] = (person_id, entry)
+        self._by_case.setdefault(case_id, set()).add(schedule_id)
+
+    def add(self, rows):
+        # rows: (schedule_id, person_id, start_time, end_time, case_id)
+        with self._lock:
+            for row in rows:
+                if row[1] is not None and row[2] is not None:
+                    self._add(*row)
+
+    def remove(self, schedule_ids):
+        with self._lock:
+            for schedule_id in schedule_ids:
+                person_id, entry = self._by_id.pop(schedule_id, (None, None))
+                if entry is None:
+                    continue
+                self._by_case.get(entry[3], set()).discard(schedule_id)
+                entries = self._entries[person_id]
+                index = bisect.bisect_left(self._starts[person_id], entry[0])
+                while entries[index] != entry:
+                    index += 1
+                del entries[index]
+                del self._starts[person_id][index]
+
+    def remove_case(self, case_id):
+        with self._lock:
+            schedule_ids = list(self._by_case.pop(case_id, ()))
+        self.remove(schedule_ids)
+
+    def conflicts(self, person_id, start_time, end_time):
+        end_time = max(end_time or start_time, start_time)
+        with self._lock:
+            starts = self._starts.get(person_id)
+            if not starts:
+                return []
+            entries = self._entries[person_id]
+            earliest = start_time - self._max_length[person_id]
+            found = []
+            # Entries starting at/after end_time can't overlap; for a point-in-time
+            # query, one starting exactly at it does
+            index = bisect.bisect_left(starts, end_time) if end_time > start_time \
+                else bisect.bisect_right(starts, end_time)
+            for i in range(index - 1, -1, -1):
+                entry_start, entry_end, schedule_id, case_id = entries[i]
+                if entry_start < earliest:
+                    break
+                # Back-to-back schedules don't conflict; same-start ones always do
+                if entry_end > start_time or entry_start == start_time:
+                    found.append({
+                        "schedule_id": schedule_id,
+                        "case_id": case_id,
+                        "start_time": entry_start.isoformat(),
+                        "end_time": entry_end.isoformat(),
+                    })
+            found.reverse()
+            return found
+
+schedule_index = ScheduleIndex()
+schedule_index.load(con)
+
+def find_schedule_conflicts(person_ids, start_time, end_time):
+    conflicts = {}
+    # The index is keyed like schedules.person_id (VARCHAR); clients send numbers
+    for person_id in map(str, person_ids):
+        found = current_tenant().schedule_index.conflicts(person_id, start_time, end_time)
+        if found:
+            conflicts[person_id] = found
+    return conflicts
+
+def check_schedule_conflicts(con, data):
+    """query_db endpoint: ``data`` has startTime/endTime/date like a proceeding
+    plus either ``participants`` ([{id}]) or ``person_ids``. Returns
+    {person_id: [overlapping schedules]}; empty means no conflicts."""
+    person_ids = data.get('person_ids') or [
+        participant.get('id') for participant in data.get('participants', []) or [] if participant.get('id')
+    ]
+    start_time = normalize_timestamp(data.get('startTime'), data.get('date'))
+    end_time = normalize_timestamp(data.get('endTime'), data.get('date'))
+    if start_time is None:
+        raise ValueError("startTime is required")
+    return find_schedule_conflicts(person_ids, start_time, end_time)
+
+def create_proceeding(con, data):
+    ensure_case_exists(con, data.get('caseId'))
+    # The client usually supplies its own id; fall back to the sequence otherwise
+    if not data.get('id'):
+        data = {**data, 'id': current_tenant().proceeding_ids.next_id(con)}
+
+    start_time = normalize_timestamp(data.get('startTime'), data.get('date'))
+    end_time = normalize_timestamp(data.get('endTime'), data.get('date'))
     participants = data.get("participants", []) or []
     participants_data = [
         (
             data.get("id", None),
-            participant.get("name", None),
+            participant_id(participant),
             participant.get("name", None),
             participant.get("role", None)
         )
         for participant in participants
     ]
+    schedules_data = [
+        (
+            str(current_tenant().schedule_ids.next_id(con)),
+            data.get("caseId"),
+            participant_id(participant),
+            start_time,
+            end_time,
+            f"Proceeding {data.get('id')} schedule",
+            "scheduled"
+        )
+        for participant in participants
+        if participant.get("id")
+    ]
 
-    if participants_data:
-        con.executemany("""
-            INSERT INTO proceeding_participants (proceeding_id, person_id, name, role)
-            VALUES (?, ?, ?, ?)
-        """, participants_data)
-    
-    for participant in participants:
-        person_id = participant.get("id")
-        if not person_id:
-            continue
-
-        schedule_id = generate_schedule_id(person_id, data.get("startTime"))
+    if data.get('rejectConflicts') and start_time is not None:
+        conflicts = find_schedule_conflicts([row[2] for row in schedules_data], start_time, end_time)
+        if conflicts:
+            raise ScheduleConflict(f"Schedule conflicts: {json.dumps(conflicts)}")
 
+    with transaction(con):
         con.execute("""
-            INSERT INTO schedules (
-                schedule_id, case_id, person_id, start_time, end_time, description, status
+            INSERT INTO proceedings (
+                proceeding_id, case_id, start_time, end_time, summary, content, people_count, date_created, date_updated, status
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            schedule_id,
-            data.get("caseId"),
-            person_id,
-            normalize_timestamp(data.get("startTime"), data.get('date')),
-            normalize_timestamp(data.get("endTime"), data.get('date')),
-            f"Proceeding {data.get('id')} schedule",
-            "scheduled"
+            data.get('id', None),
+            data.get('caseId', None),
+            start_time,
+            end_time,
+            data.get('summary', None),
+            data.get('content', None),
+            len(participants),
+            normalize_timestamp(None, data.get('dateCreated')),
+            normalize_timestamp(None, data.get('dateUpdated')),
+            data.get('status', None)
+        ))
+        current_tenant().rollups.mark(con, case_ids=[data.get('caseId')])
+
+        insert_rows(con, "proceeding_participants",
+                    ("proceeding_id", "person_id", "name", "role"), participants_data)
+        insert_rows(con, "schedules",
+                    ("schedule_id", "case_id", "person_id", "start_time", "end_time", "description", "status"),
+                    schedules_data)
+        reindex_search(con, 'proceeding', [data.get('id')])
+        after_commit(con, lambda: current_tenant().schedule_index.add(
+            [(row[0], row[2], row[3], row[4], row[1]) for row in schedules_data]
         ))
 
+        invalidate_cached(con, proceedings_tag(data.get('caseId')))
+        publish_change(con, case_room(data.get('caseId')), 'proceeding', data.get('id'), 'created', {
+            "caseId": data.get('caseId'),
+            "startTime": iso(start_time),
+            "endTime": iso(end_time),
+            "summary": data.get('summary'),
+            "content": data.get('content'),
+            "participants": [
+                {"id": row[1], "name": row[2], "role": row[3]} for row in participants_data
+            ],
+            "date": start_time.date().isoformat() if start_time else None,
+            "status": data.get('status'),
+        })
+
     print("Created proceeding ID:", data.get('id', None))
     return data.get('id', None)
 
 
-def update_proceeding(data):
-    con.execute("""
-        UPDATE proceedings
-        SET
-            case_id = ?,             -- 2nd param
-            start_time = ?,          -- 3rd
-            end_time = ?,            -- 4th
-            summary = ?,             -- 5th
-            content = ?,             -- 6th
-            people_count = ?,        -- 7th
-            date_created = ?,        -- 8th
-            date_updated = ?,        -- 9th
-            status = ?               -- 10th
-        WHERE proceeding_id = ?      -- 1st param
-    """, (
-        data.get('caseId'),
-        normalize_timestamp(data.get('startTime'), data.get('date')),
-        normalize_timestamp(data.get('endTime'), data.get('date')),
-        data.get('summary'),
-        data.get('content'),
-        len(data.get('participants') or []),
-        normalize_timestamp(None, data.get('dateCreated')),
-        normalize_timestamp(None, data.get('dateUpdated')),
-        data.get('status'),
-        data.get('id')  # proceeding_id as WHERE clause
-    ))
-    
-
-    # First delete old participants (single statement, not executemany)
-    con.execute("""
-        DELETE FROM proceeding_participants
-        WHERE proceeding_id = ?
-    """, (data['id'],))
+# Client field -> proceedings column, for patch-style updates
+PROCEEDING_FIELD_COLUMNS = {
+    'caseId': 'case_id',
+    'startTime': 'start_time',
+    'endTime': 'end_time',
+    'summary': 'summary',
+    'content': 'content',
+    'dateCreated': 'date_created',
+    'dateUpdated': 'date_updated',
+    'status': 'status',
+}
 
-    # Then insert updated participants
-    participants_data = [
-        (data["id"], participant["id"], participant["name"], participant["role"])
-        for participant in data["participants"]
+def proceeding_patch_value(data, field):
+    if field in ('startTime', 'endTime'):
+        return normalize_timestamp(data.get(field), data.get('date'))
+    if field in ('dateCreated', 'dateUpdated'):
+        return normalize_timestamp(None, data.get(field))
+    return data.get(field)
+
+def participant_id(participant):
+    # person_id is VARCHAR while the client sends numeric ids; participants
+    # without an id are keyed by name, as older rows were
+    if participant.get("id") is None:
+        return participant.get("name")
+    return str(participant["id"])
+
+def diff_participants(current, incoming):
+    # Both sides map person_id -> (name, role). Returns rows to insert,
+    # person_ids to delete and rows whose name/role changed.
+    added = [(person_id,) + person for person_id, person in incoming.items() if person_id not in current]
+    removed = [person_id for person_id in current if person_id not in incoming]
+    changed = [
+        (person_id,) + person for person_id, person in incoming.items()
+        if person_id in current and current[person_id] != person
     ]
+    return added, removed, changed
+
+def proceeding_change_fields(con, proceeding_id):
+    case_id, start_time, end_time, summary, content, status = con.execute(
+        "SELECT case_id, start_time, end_time, summary, content, status FROM proceedings WHERE proceeding_id = ?",
+        (proceeding_id,)
+    ).fetchone()
+    participants = con.execute(
+        "SELECT person_id, name, role FROM proceeding_participants WHERE proceeding_id = ? ORDER BY person_id",
+        (proceeding_id,)
+    ).fetchall()
+    return {
+        "caseId": case_id,
+        "startTime": iso(start_time),
+        "endTime": iso(end_time),
+        "summary": summary,
+        "content": content,
+        "participants": [{"id": row[0], "name": row[1], "role": row[2]} for row in participants],
+        "date": start_time.date().isoformat() if start_time else None,
+        "status": status,
+    }
 
-    con.executemany("""
-        INSERT INTO proceeding_participants (proceeding_id, person_id, name, role)
-        VALUES (?, ?, ?, ?)
-    """, participants_data)
+def update_proceeding(con, data):
+    """Apply only what changed: fields missing from ``data`` are left alone, and
+    participants are diffed against the stored rows instead of rewritten."""
+    proceeding_id = data['id']
+    fields = [field for field in PROCEEDING_FIELD_COLUMNS if field in data]
+    columns = [PROCEEDING_FIELD_COLUMNS[field] for field in fields]
+
+    with transaction(con):
+        current = con.execute(
+            f"SELECT {', '.join(['proceeding_id', 'case_id'] + columns)} FROM proceedings WHERE proceeding_id = ?",
+            (proceeding_id,)
+        ).fetchone()
+        if not current:
+            raise ValueError(f"Invalid proceeding_id: {proceeding_id}")
+
+        changes = {}
+        changed_fields = {}
+        for field, column, current_value in zip(fields, columns, current[2:]):
+            value = proceeding_patch_value(data, field)
+            if value != current_value:
+                changes[column] = value
+                changed_fields[field] = iso(value)
+
+        added = removed = changed = []
+        if data.get('participants') is not None:
+            current_participants = {
+                row[0]: (row[1], row[2])
+                for row in con.execute(
+                    "SELECT person_id, name, role FROM proceeding_participants WHERE proceeding_id = ?",
+                    (proceeding_id,)
+                ).fetchall()
+            }
+            incoming_participants = {
+                participant_id(participant): (participant.get("name"), participant.get("role"))
+                for participant in data["participants"]
+            }
+            added, removed, changed = diff_participants(current_participants, incoming_participants)
+            if added or removed:
+                changes['people_count'] = len(incoming_participants)
+
+        if changes:
+            # Only touched columns are written; in particular case_id is left
+            # alone unless it really changed (DuckDB rejects rewriting a
+            # foreign key column on a row that other tables reference)
+            con.execute(
+                f"UPDATE proceedings SET {', '.join(f'{column} = ?' for column in changes)} WHERE proceeding_id = ?",
+                list(changes.values()) + [proceeding_id]
+            )
+        if changes.keys() & {'start_time', 'case_id'}:
+            current_tenant().rollups.mark(con, case_ids=[current[1], changes.get('case_id', current[1])])
+        if changes.keys() & {'summary', 'content', 'case_id'}:
+            reindex_search(con, 'proceeding', [proceeding_id])
+
+        if removed:
+            con.execute(
+                "DELETE FROM proceeding_participants WHERE proceeding_id = ? AND list_contains(?, person_id)",
+                (proceeding_id, removed)
+            )
+        insert_rows(con, "proceeding_participants",
+                    ("proceeding_id", "person_id", "name", "role"),
+                    [(proceeding_id,) + participant for participant in added])
+        for person_id, name, role in changed:
+            con.execute(
+                "UPDATE proceeding_participants SET name = ?, role = ? WHERE proceeding_id = ? AND person_id = ?",
+                (name, role, proceeding_id, person_id)
+            )
 
-    print("Updated proceeding ID:", data['id'])
+        if added or removed or changed:
+            changed_fields['participants'] = {
+                'added': [{"id": row[0], "name": row[1], "role": row[2]} for row in added],
+                'removed': removed,
+                'changed': [{"id": row[0], "name": row[1], "role": row[2]} for row in changed],
+            }
+        if changed_fields:
+            invalidate_cached(con, proceedings_tag(current[1]), proceedings_tag(changes.get('case_id', current[1])))
+            publish_change(con, case_room(current[1]), 'proceeding', proceeding_id, 'updated', changed_fields)
+        if 'case_id' in changes:
+            # Viewers of the destination case have never seen this proceeding,
+            # so they get all of it rather than the changed fields
+            publish_change(con, case_room(changes['case_id']), 'proceeding', proceeding_id, 'created',
+                           proceeding_change_fields(con, proceeding_id))
+
+    print("Updated proceeding ID:", proceeding_id, "columns:", list(changes),
+          "participants +%d -%d ~%d" % (len(added), len(removed), len(changed)))
     return data.get('id', None)
 
-def delete_case(data):
-    #Delete all schedules associated with the case
-    con.execute("""
-        DELETE FROM schedules
-        WHERE case_id =?
-    """, (data['case_id'],))
-
-    #Delete all proceedings associated with the case
-    con.execute("""
-        DELETE FROM proceeding_participants
-        WHERE proceeding_id IN (
-            SELECT proceeding_id FROM proceedings WHERE case_id =?
-        )
-    """, (data['case_id'],))
-
-    con.execute("""
-        DELETE FROM proceeding_schedules
-        WHERE proceeding_id IN (
-            SELECT proceeding_id FROM proceedings WHERE case_id =?
-        )
-    """, (data['case_id'],))
-
-    con.execute("""
-        DELETE FROM proceedings
-        WHERE case_id =?
-    """, (data['case_id'],))
+def delete_in_phases(con, phases):
+    # DuckDB checks foreign keys against committed data only, so a parent row
+    # can't be deleted in the same transaction that removed the rows
+    # referencing it. Each phase is one transaction, children before parents.
+    if id(con) in _open_transactions:
+        raise RuntimeError("Cascading deletes can't run inside an open transaction")
+    for statements in phases:
+        with transaction(con):
+            for sql, params in statements:
+                con.execute(sql, params)
+
+def delete_case(con, data):
+    params = (data['case_id'],)
+    case = con.execute("SELECT priority FROM cases WHERE case_id = ?", params).fetchone()
+    blobs = [row[0] for row in con.execute("SELECT sha256 FROM attachments WHERE case_id = ?", params).fetchall()]
+    # Search rows are removed per proceeding, by doc_id equality
+    proceeding_ids = [row[0] for row in con.execute(
+        "SELECT proceeding_id FROM proceedings WHERE case_id = ?", params).fetchall()]
+    try:
+        delete_in_phases(con, [
+            [
+                ("DELETE FROM attachments WHERE case_id = ?", params),
+                #Delete all proceedings associated with the case
+                ("""
+                    DELETE FROM proceeding_participants
+                    WHERE proceeding_id IN (
+                        SELECT proceeding_id FROM proceedings WHERE case_id = ?
+                    )
+                """, params),
+                ("""
+                    DELETE FROM proceeding_schedules
+                    WHERE proceeding_id IN (
+                        SELECT proceeding_id FROM proceedings WHERE case_id = ?
+                    )
+                """, params),
+            ],
+            [
+                (f"DELETE FROM {table_name} WHERE doc_type = 'proceeding' AND doc_id = ?", (proceeding_id,))
+                for proceeding_id in proceeding_ids
+                for table_name in ('search_postings', 'search_documents')
+            ] + [
+                ("DELETE FROM proceedings WHERE case_id = ?", params),
+                #Delete all schedules associated with the case (after the
+                #proceeding_schedules rows that reference them)
+                ("DELETE FROM schedules WHERE case_id = ?", params),
+            ],
+            [
+                ("DELETE FROM search_postings WHERE doc_type = 'case' AND doc_id = ?", params),
+                ("DELETE FROM search_documents WHERE doc_type = 'case' AND doc_id = ?", params),
+                ("DELETE FROM cases WHERE case_id = ?", params),
+            ],
+        ])
+    finally:
+        # Earlier phases may have committed even if a later one failed
+        result_cache.invalidate(*tenant_tags('cases', proceedings_tag(data['case_id'])))
+        if not con.execute("SELECT 1 FROM schedules WHERE case_id = ? LIMIT 1", params).fetchone():
+            current_tenant().schedule_index.remove_case(data['case_id'])
+        current_tenant().rollups.mark(con, case_ids=[data['case_id']], priorities=[case[0]] if case else [])
+        remove_unreferenced_blobs(con, blobs)
+
+    publish_change(con, [cases_room(), case_room(data['case_id'])], 'case', data['case_id'], 'deleted')
 
-    con.execute("""
-        DELETE FROM cases
-        WHERE case_id =?
-    """, (data['case_id'],))
-       
     print("Deleted case ID:", data['case_id'])
     return data.get('case_id', None)
 
-def delete_proceeding(data):
-    con.execute("""
-        DELETE FROM proceeding_participants
-        WHERE proceeding_id =?
-    """, (data['id'],))
-
-    con.execute("""
-        DELETE FROM proceeding_schedules
-        WHERE proceeding_id =?
-    """, (data['id'],))
-
-    con.execute("""
-        DELETE FROM proceedings
-        WHERE proceeding_id =?
-    """, (data['id'],))
+def delete_proceeding(con, data):
+    params = (data['id'],)
+    row = con.execute("SELECT case_id FROM proceedings WHERE proceeding_id = ?", params).fetchone()
+    blobs = [blob[0] for blob in con.execute("SELECT sha256 FROM attachments WHERE proceeding_id = ?", params).fetchall()]
+    try:
+        delete_in_phases(con, [
+            [
+                ("DELETE FROM attachments WHERE proceeding_id = ?", params),
+                ("DELETE FROM proceeding_participants WHERE proceeding_id = ?", params),
+                ("DELETE FROM proceeding_schedules WHERE proceeding_id = ?", params),
+            ],
+            [
+                ("DELETE FROM search_postings WHERE doc_type = 'proceeding' AND doc_id = ?", params),
+                ("DELETE FROM search_documents WHERE doc_type = 'proceeding' AND doc_id = ?", params),
+                ("DELETE FROM proceedings WHERE proceeding_id = ?", params),
+            ],
+        ])
+    finally:
+        if row:
+            result_cache.invalidate(*tenant_tags(proceedings_tag(row[0])))
+            current_tenant().rollups.mark(con, case_ids=[row[0]])
+        remove_unreferenced_blobs(con, blobs)
+
+    if row:
+        publish_change(con, case_room(row[0]), 'proceeding', data['id'], 'deleted')
 
     print("Deleted proceeding ID:", data['id'])
     return data.get('id', None)
@@ -353,93 +1672,413 @@ def delete_proceeding(data):
 # con = duckdb.connect('my_database.duckdb')
 #case_id = create_case(con, "Case A", "Investigate client complaint")
 #print(f"New case ID: {case_id}")
-def fetchProceedings(data):
-    con.execute("""
-        SELECT
-            proceeding_id,
-            case_id,
-            start_time,
-            end_time,
-            summary,
-            content,
-            people_count,
-            date_created,
-            date_updated,
-            status
-        FROM proceedings
-        WHERE case_id = ?
+# Client-facing proceeding shape, built by DuckDB: timestamps are formatted
+# in SQL and whole result sets come back as one JSON document (see fetch_json)
+PROCEEDING_COLUMNS = """
+        p.proceeding_id AS id,
+        p.case_id AS caseId,
+        strftime(p.start_time, '%Y-%m-%dT%H:%M:%S') AS startTime,
+        strftime(p.end_time, '%Y-%m-%dT%H:%M:%S') AS endTime,
+        p.summary AS summary,
+        p.content AS content,
+        strftime(CAST(p.start_time AS DATE), '%Y-%m-%d') AS date,
+        strftime(p.date_created, '%Y-%m-%dT%H:%M:%S') AS dateCreated,
+        strftime(p.date_updated, '%Y-%m-%dT%H:%M:%S') AS dateUpdated,
+        p.status AS status,"""
+
+# Same shape with epoch-millisecond timestamps for the columnar wire formats
+PROCEEDING_COLUMNAR_COLUMNS = """
+        p.proceeding_id AS id,
+        p.case_id AS caseId,
+        epoch_ms(p.start_time) AS startTime,
+        epoch_ms(p.end_time) AS endTime,
+        p.summary AS summary,
+        p.content AS content,
+        strftime(CAST(p.start_time AS DATE), '%Y-%m-%d') AS date,
+        epoch_ms(p.date_created) AS dateCreated,
+        epoch_ms(p.date_updated) AS dateUpdated,
+        p.status AS status,"""
+
+PROCEEDINGS_WITH_PARTICIPANTS_QUERY = """
+    SELECT {columns}
+        -- Aggregate participants in the same scan instead of one query per proceeding,
+        -- in a stable order so identical data always serializes the same way
+        COALESCE(
+            list(struct_pack(id := pp.person_id, name := pp.name, role := pp.role) ORDER BY pp.person_id)
+                FILTER (WHERE pp.person_id IS NOT NULL),
+            []
+        ) AS participants
+    FROM proceedings p
+    LEFT JOIN proceeding_participants pp ON pp.proceeding_id = p.proceeding_id
+    WHERE {where}
+    GROUP BY ALL
+    -- Positional so it works for both column lists: case, start, proceeding id
+    ORDER BY 2, 3, 1
+"""
+
+# List view of a case's proceedings: no content and no participant join, so
+# the scan only reads the narrow columns however long the transcripts are.
+# Full records come from fetchProceeding by id.
+PROCEEDING_SUMMARY_COLUMNS = """
+        p.proceeding_id AS id,
+        p.case_id AS caseId,
+        strftime(p.start_time, '%Y-%m-%dT%H:%M:%S') AS startTime,
+        strftime(p.end_time, '%Y-%m-%dT%H:%M:%S') AS endTime,
+        strftime(CAST(p.start_time AS DATE), '%Y-%m-%d') AS date,
+        p.summary AS summary,
+        COALESCE(p.people_count, 0) AS participantCount,
+        strftime(p.date_created, '%Y-%m-%dT%H:%M:%S') AS dateCreated,
+        strftime(p.date_updated, '%Y-%m-%dT%H:%M:%S') AS dateUpdated,
+        p.status AS status"""
+
+PROCEEDING_SUMMARY_COLUMNAR_COLUMNS = """
+        p.proceeding_id AS id,
+        p.case_id AS caseId,
+        epoch_ms(p.start_time) AS startTime,
+        epoch_ms(p.end_time) AS endTime,
+        strftime(CAST(p.start_time AS DATE), '%Y-%m-%d') AS date,
+        p.summary AS summary,
+        COALESCE(p.people_count, 0) AS participantCount,
+        epoch_ms(p.date_created) AS dateCreated,
+        epoch_ms(p.date_updated) AS dateUpdated,
+        p.status AS status"""
+
+def fetch_json(con, query, params=()):
+    """Run a query returning (to_json(list(...)), row count) and wrap it as
+    RawJSON, so rows are neither converted field by field nor parsed in Python."""
+    text, length = con.execute(query, params).fetchone()
+    return RawJSON(text or '[]', length)
+
+def fetchProceedings(con, data):
+    proceedings = fetch_json(con, f"""
+        SELECT to_json(list(p ORDER BY p.startTime, p.id)), COUNT(*)
+        FROM ({PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNS, where="p.case_id = ?")}) p
     """, (data['case_id'],))
 
-    rows = con.fetchall()
-    proceedings = []
+    print("Fetched", len(proceedings), "proceedings for case ID:", data['case_id'])
+    return proceedings
 
-    for row in rows:
-        proceeding_id = row[0]
-        con.execute("""
-            SELECT person_id, name, role
-            FROM proceeding_participants
-            WHERE proceeding_id = ?
-        """, (proceeding_id,))
-        participants = [
-            {
-                "id": p[0],
-                "name": p[1],
-                "role": p[2]
-            }
-            for p in con.fetchall()
-        ]
-
-        # Convert all datetime fields to ISO format strings
-        proceedings.append({
-            "id": row[0],
-            "caseId": row[1],
-            "startTime": row[2].isoformat() if row[2] else None,
-            "endTime": row[3].isoformat() if row[3] else None,
-            "summary": row[4],
-            "content": row[5],
-            "participants": participants,
-            "date": row[2].date().isoformat() if row[2] else None,
-            "dateCreated": row[7].isoformat() if row[7] else None,
-            "dateUpdated": row[8].isoformat() if row[8] else None,
-            "status": row[9]
-        })
+def fetchProceedingSummaries(con, data):
+    proceedings = fetch_json(con, f"""
+        SELECT to_json(list(p ORDER BY p.startTime, p.id)), COUNT(*)
+        FROM (SELECT {PROCEEDING_SUMMARY_COLUMNS} FROM proceedings p WHERE p.case_id = ?) p
+    """, (data['case_id'],))
 
-    print(proceedings)
+    print("Fetched", len(proceedings), "proceeding summaries for case ID:", data['case_id'])
     return proceedings
 
+def fetchProceeding(con, data):
+    # One full proceeding (content and participants included), or None
+    text, = con.execute(f"""
+        SELECT to_json(p)
+        FROM ({PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNS, where="p.proceeding_id = ?")}) p
+    """, (data['id'],)).fetchone() or (None,)
+    return RawJSON(text, 1) if text else None
+
+def fetchProceedingsForCases(con, data):
+    # Bulk variant for dashboard views: one query for any number of cases,
+    # grouped by case_id in the response ({case_id: [proceedings...]})
+    case_ids = [int(case_id) for case_id in data.get('case_ids', []) or []]
+    if not case_ids:
+        return {}
+
+    # One JSON array per case; Python only loops over cases, not rows
+    rows = con.execute(f"""
+        SELECT p.caseId, to_json(list(p ORDER BY p.startTime, p.id)), COUNT(*)
+        FROM ({PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNS, where="list_contains(?, p.case_id)")}) p
+        GROUP BY p.caseId
+    """, (case_ids,)).fetchall()
+
+    proceedings_by_case = {case_id: [] for case_id in case_ids}
+    for case_id, proceedings, length in rows:
+        proceedings_by_case[case_id] = RawJSON(proceedings, length)
+
+    print("Fetched proceedings for", len(rows), "of", len(case_ids), "cases")
+    return proceedings_by_case
+
+def rows_to_columnar(columns, rows, timestamp_columns=()):
+    """Column-oriented result set: one array per column instead of one dict
+    per row, so key strings are sent once. ``timestamps`` lists the columns
+    holding epoch milliseconds."""
+    values = [list(column) for column in zip(*rows)] if rows else [[] for _ in columns]
+    return {
+        'columns': list(columns),
+        'values': values,
+        'length': len(rows),
+        'timestamps': list(timestamp_columns),
+    }
+
+def stream_json(con, query, params=(), chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield ('json', RawJSON, rows) chunks for a query selecting one
+    to_json(...) text per row; only ``chunk_rows`` rows are held at a time."""
+    result = con.execute(query, params)
+    while True:
+        rows = result.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield 'json', RawJSON("[" + ",".join(row[0] for row in rows) + "]", len(rows)), len(rows)
+
+def stream_columnar(con, query, params, fmt, timestamp_columns=(), chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield (format, data, rows) chunks of a query in a columnar wire format.
+    Arrow chunks are record batches straight from DuckDB, each sent as a
+    self-contained IPC stream."""
+    result = con.execute(query, params)
+    if fmt == 'arrow':
+        for batch in result.to_arrow_reader(chunk_rows):
+            sink = pyarrow.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+            yield 'arrow', sink.getvalue().to_pybytes(), batch.num_rows
+        return
+    columns = [column[0] for column in result.description]
+    while True:
+        rows = result.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield encode_payload(rows_to_columnar(columns, rows, timestamp_columns), fmt) + (len(rows),)
+
+def streamProceedings(con, data, fmt):
+    params = (data['case_id'],)
+    if fmt == 'json':
+        return stream_json(con, f"""
+            SELECT to_json(p)
+            FROM ({PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNS, where="p.case_id = ?")}) p
+            ORDER BY p.startTime, p.id
+        """, params)
+    return stream_columnar(
+        con, PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNAR_COLUMNS, where="p.case_id = ?"),
+        params, fmt, ('startTime', 'endTime', 'dateCreated', 'dateUpdated')
+    )
+
+PROCEEDING_SUMMARIES_COLUMNAR_QUERY = f"""
+    SELECT {PROCEEDING_SUMMARY_COLUMNAR_COLUMNS}
+    FROM proceedings p
+    WHERE p.case_id = ?
+    ORDER BY p.start_time, p.proceeding_id
+"""
+
+def streamProceedingSummaries(con, data, fmt):
+    params = (data['case_id'],)
+    if fmt == 'json':
+        return stream_json(con, f"""
+            SELECT to_json(p)
+            FROM (SELECT {PROCEEDING_SUMMARY_COLUMNS} FROM proceedings p WHERE p.case_id = ?) p
+            ORDER BY p.startTime, p.id
+        """, params)
+    return stream_columnar(con, PROCEEDING_SUMMARIES_COLUMNAR_QUERY, params, fmt,
+                           ('startTime', 'endTime', 'dateCreated', 'dateUpdated'))
+
+def fetchProceedingSummariesColumnar(con, data):
+    result = con.execute(PROCEEDING_SUMMARIES_COLUMNAR_QUERY, (data['case_id'],))
+    columns = [column[0] for column in result.description]
+    return rows_to_columnar(columns, result.fetchall(),
+                            ('startTime', 'endTime', 'dateCreated', 'dateUpdated'))
+
+def fetchProceedingsColumnar(con, data):
+    result = con.execute(
+        PROCEEDINGS_WITH_PARTICIPANTS_QUERY.format(columns=PROCEEDING_COLUMNAR_COLUMNS, where="p.case_id = ?"),
+        (data['case_id'],)
+    )
+    columns = [column[0] for column in result.description]
+    return rows_to_columnar(columns, result.fetchall(),
+                            ('startTime', 'endTime', 'dateCreated', 'dateUpdated'))
+
 
 
 def get_all_schedules_for_person(con, person_id):
+    # The JSON text is produced by DuckDB and returned as-is
     query = """
-    SELECT 
-        s.schedule_id,
-        s.start_time,
-        s.end_time,
-        s.description,
-        ps.proceeding_id,
-        p.case_id
-    FROM schedules s
-    LEFT JOIN proceeding_schedules ps ON ps.schedule_id = s.schedule_id
-    LEFT JOIN proceedings p ON ps.proceeding_id = p.proceeding_id
-    WHERE s.person_id = ?
-    ORDER BY s.start_time;
+    SELECT COALESCE(to_json(list(r ORDER BY r.start_time, r.schedule_id)), '[]')
+    FROM (
+        SELECT
+            s.schedule_id,
+            CAST(s.start_time AS VARCHAR) AS start_time,
+            CAST(s.end_time AS VARCHAR) AS end_time,
+            s.description,
+            ps.proceeding_id,
+            p.case_id
+        FROM schedules s
+        LEFT JOIN proceeding_schedules ps ON ps.schedule_id = s.schedule_id
+        LEFT JOIN proceedings p ON ps.proceeding_id = p.proceeding_id
+        WHERE s.person_id = ?
+    ) r;
     """
-    
-    rows = con.execute(query, (person_id,)).fetchall()
-    
-    result = [
-        {
-            "schedule_id": row[0],
-            "start_time": str(row[1]),
-            "end_time": str(row[2]),
-            "description": row[3],
-            "proceeding_id": row[4],
-            "case_id": row[5]
-        }
-        for row in rows
-    ]
-    
-    return json.dumps(result, indent=2)
+
+    return con.execute(query, (person_id,)).fetchone()[0]
+
+# Widest window fetchTimeline will serve in one request
+TIMELINE_MAX_DAYS = 62
+
+def fetchTimeline(con, data):
+    """Schedules for ``person_ids`` overlapping the window [from, to), grouped
+    by day: [{"day": "YYYY-MM-DD", "schedules": [...]}] with days ascending and
+    each day's schedules ordered by start time."""
+    person_ids = data.get('person_ids') or []
+    window_start = normalize_timestamp(data.get('from'))
+    window_end = normalize_timestamp(data.get('to'))
+    if window_start is None or window_end is None or window_end <= window_start:
+        raise ValueError("A valid [from, to) window is required")
+    if (window_end - window_start).days > TIMELINE_MAX_DAYS:
+        raise ValueError(f"Timeline window is limited to {TIMELINE_MAX_DAYS} days")
+    if not person_ids:
+        return []
+    # schedules.person_id is VARCHAR; clients send numbers
+    person_ids = [str(person_id) for person_id in person_ids]
+
+    # Timestamps are formatted and rows grouped inside DuckDB, so the Python
+    # side only wraps the already-shaped rows. The person lookup is
+    # materialized on its own so it stays an index scan on
+    # schedules_person_idx; with the window filter pushed into the same scan
+    # DuckDB would read the whole table.
+    rows = con.execute(f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT * FROM schedules
+            WHERE person_id IN ({', '.join('?' for _ in person_ids)})
+        )
+        SELECT
+            -- Schedules that began before the window land on its first day
+            strftime(CAST(GREATEST(s.start_time, ?) AS DATE), '%Y-%m-%d') AS day,
+            list(struct_pack(
+                schedule_id := s.schedule_id,
+                person_id := s.person_id,
+                case_id := s.case_id,
+                proceeding_id := ps.proceeding_id,
+                start_time := strftime(s.start_time, '%Y-%m-%dT%H:%M:%S'),
+                end_time := strftime(s.end_time, '%Y-%m-%dT%H:%M:%S'),
+                description := s.description,
+                status := s.status
+            ) ORDER BY s.start_time, s.person_id) AS schedules
+        FROM candidates s
+        LEFT JOIN proceeding_schedules ps ON ps.schedule_id = s.schedule_id
+        WHERE s.start_time < ?
+          AND (s.start_time >= ? OR s.end_time > ?)
+        GROUP BY day
+        ORDER BY day
+    """, person_ids + [window_start, window_end, window_start, window_start]).fetchall()
+
+    return [{"day": row[0], "schedules": row[1]} for row in rows]
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# BM25 parameters (same defaults as DuckDB's fts extension)
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_LENGTH = 160
+
+def make_snippet(text, terms):
+    """Window of ``text`` around the first query term, with the [start, end)
+    offsets of every term match inside the snippet."""
+    if not text:
+        return "", []
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - SNIPPET_LENGTH // 4) if first else 0
+    snippet = text[start:start + SNIPPET_LENGTH]
+    highlights = [[m.start(), m.end()] for m in pattern.finditer(snippet)]
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + SNIPPET_LENGTH < len(text) else ""
+    return prefix + snippet + suffix, [[a + len(prefix), b + len(prefix)] for a, b in highlights]
+
+def searchProceedings(con, data):
+    """Ranked keyword search over proceedings (summary, content) and cases
+    (title, description). ``data``: query, optional types (['proceeding',
+    'case']), case_id filter, limit and page. Returns {results, total, page}."""
+    query = (data.get('query') or '').strip()
+    doc_types = data.get('types') or list(SEARCH_SOURCES)
+    if any(doc_type not in SEARCH_SOURCES for doc_type in doc_types):
+        raise ValueError(f"Invalid search types: {doc_types}")
+    limit = max(1, min(int(data.get('limit') or SEARCH_PAGE_SIZE), SEARCH_MAX_PAGE_SIZE))
+    page = max(0, int(data.get('page') or 0))
+    if not query:
+        return {'results': [], 'total': 0, 'page': page}
+
+    case_filter = "AND d.case_id = ?" if data.get('case_id') is not None else ""
+    case_params = (data['case_id'],) if data.get('case_id') is not None else ()
+    rows = con.execute(f"""
+        WITH query_terms AS (
+            SELECT DISTINCT term
+            FROM (SELECT unnest(regexp_split_to_array(lower(?), ?)) AS term)
+            WHERE length(term) > 1
+        ),
+        corpus AS (
+            SELECT doc_type, COUNT(*) AS n, AVG(length) AS avgdl
+            FROM search_documents
+            WHERE list_contains(?, doc_type)
+            GROUP BY doc_type
+        ),
+        matches AS (
+            SELECT p.term, p.doc_type, p.doc_id, p.tf
+            FROM search_postings p
+            JOIN query_terms q ON q.term = p.term
+            WHERE list_contains(?, p.doc_type)
+        ),
+        document_frequency AS (
+            SELECT term, doc_type, COUNT(*) AS df
+            FROM matches
+            GROUP BY term, doc_type
+        ),
+        scored AS (
+            SELECT
+                m.doc_type,
+                m.doc_id,
+                d.case_id,
+                SUM(
+                    ln((c.n - f.df + 0.5) / (f.df + 0.5) + 1)
+                    * m.tf * ({BM25_K1} + 1)
+                    / (m.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * d.length / GREATEST(c.avgdl, 1)))
+                ) AS score
+            FROM matches m
+            JOIN document_frequency f ON f.term = m.term AND f.doc_type = m.doc_type
+            JOIN corpus c ON c.doc_type = m.doc_type
+            JOIN search_documents d ON d.doc_type = m.doc_type AND d.doc_id = m.doc_id
+            WHERE TRUE {case_filter}
+            GROUP BY m.doc_type, m.doc_id, d.case_id
+        )
+        SELECT doc_type, doc_id, case_id, score, COUNT(*) OVER () AS total
+        FROM scored
+        ORDER BY score DESC, doc_type, doc_id
+        LIMIT ? OFFSET ?
+    """, (query, SEARCH_TOKEN_SPLIT, doc_types, doc_types) + case_params + (limit, page * limit)).fetchall()
+
+    if not rows:
+        return {'results': [], 'total': 0, 'page': page}
+
+    # Snippets need the text of this page's hits only
+    # Same tokenizer as the index, so every highlighted term is one that matched
+    terms = [term for term in SEARCH_TOKEN.findall(query.lower()) if len(term) > 1]
+    proceeding_ids = [row[1] for row in rows if row[0] == 'proceeding']
+    case_ids_on_page = [row[1] for row in rows if row[0] == 'case']
+    texts = {}
+    if proceeding_ids:
+        for proceeding_id, summary, content in con.execute(
+            "SELECT proceeding_id, summary, content FROM proceedings WHERE list_contains(?, proceeding_id)",
+            (proceeding_ids,)
+        ).fetchall():
+            texts[('proceeding', proceeding_id)] = (summary, concat_text(summary, content))
+    if case_ids_on_page:
+        for case_id, title, description in con.execute(
+            "SELECT case_id, title, description FROM cases WHERE list_contains(?, case_id)",
+            (case_ids_on_page,)
+        ).fetchall():
+            texts[('case', case_id)] = (title, concat_text(title, description))
+
+    results = []
+    for doc_type, doc_id, case_id, score, _ in rows:
+        title, text = texts.get((doc_type, doc_id), (None, ""))
+        snippet, highlights = make_snippet(text, terms)
+        results.append({
+            "type": doc_type,
+            "id": doc_id,
+            "caseId": case_id,
+            "title": title,
+            "score": round(score, 4),
+            "snippet": snippet,
+            "highlights": highlights,
+        })
+    return {'results': results, 'total': rows[0][4], 'page': page}
+
+def concat_text(*parts):
+    return " ".join(part for part in parts if part)
 
 # Example usage:
 # print(get_all_schedules_for_person(con, person_id=1))
@@ -451,14 +2090,15 @@ def ensure_person_exists(con, person_id, name="Unnamed"):
 
 # Function to insert a proceeding with participants and their schedules
 def add_proceeding_with_participants(con, case_id, summary, content, participants):
-    con.execute("""
-        INSERT INTO proceedings (proceeding_id, case_id, timestamp, summary, content) 
-        VALUES ((SELECT COALESCE(MAX(proceeding_id), 0) + 1 FROM proceedings), ?, CURRENT_TIMESTAMP, ?, ?)
-    """, (case_id, summary, content))
-    proceeding_id = con.execute("SELECT MAX(proceeding_id) FROM proceedings").fetchone()[0]
+    proceeding_id = con.execute("""
+        INSERT INTO proceedings (proceeding_id, case_id, start_time, summary, content, people_count)
+        VALUES (nextval('proceeding_id_seq'), ?, CURRENT_TIMESTAMP, ?, ?, ?)
+        RETURNING proceeding_id
+    """, (case_id, summary, content, len(participants))).fetchone()[0]
+    current_tenant().rollups.mark(con, case_ids=[case_id])
 
     for p in participants:
-        person_id = p['person_id']
+        person_id = str(p['person_id'])
         role = p.get('role', None)
         schedule = p.get('schedule', None)
 
@@ -467,17 +2107,18 @@ def add_proceeding_with_participants(con, case_id, summary, content, participant
 
         schedule_id = None
         if schedule:
-            con.execute("""
+            schedule_id, start_time, end_time = con.execute("""
                 INSERT INTO schedules (schedule_id, case_id, person_id, start_time, end_time, description)
-                VALUES ((SELECT COALESCE(MAX(schedule_id), 0) + 1 FROM schedules), ?, ?, ?, ?, ?)
+                VALUES (CAST(nextval('schedule_id_seq') AS VARCHAR), ?, ?, ?, ?, ?)
+                RETURNING schedule_id, start_time, end_time
             """, (
                 case_id,
                 person_id,
                 schedule['start_time'],
                 schedule['end_time'],
                 schedule.get('description', None)
-            ))
-            schedule_id = con.execute("SELECT MAX(schedule_id) FROM schedules").fetchone()[0]
+            )).fetchone()
+            current_tenant().schedule_index.add([(schedule_id, person_id, start_time, end_time, case_id)])
 
         con.execute("""
             INSERT INTO proceeding_participants (proceeding_id, person_id, role)
@@ -542,9 +2183,101 @@ def get_case_proceedings_json(con, case_id):
 
     return json.dumps(result, indent=2)
 
-def fetchCases(data=None):
-    query = "SELECT case_id, title, description, priority, status FROM cases"
-    rows = con.execute(query).fetchall()
+def fetchCases(con, data=None):
+    cases = fetch_json(con, """
+        SELECT to_json(list(c ORDER BY c.case_id)), COUNT(*)
+        FROM (SELECT case_id, title, description, priority, status FROM cases) c
+    """)
+    print("Emitting", len(cases), "cases")
+    return cases
+
+def fetchCasesColumnar(con, data=None):
+    rows = con.execute("SELECT case_id, title, description, priority, status FROM cases").fetchall()
+    return rows_to_columnar(('case_id', 'title', 'description', 'priority', 'status'), rows)
+
+def streamCases(con, data, fmt):
+    if fmt == 'json':
+        return stream_json(con, """
+            SELECT to_json(c)
+            FROM (SELECT case_id, title, description, priority, status FROM cases) c
+            ORDER BY c.case_id
+        """)
+    return stream_columnar(con, """
+        SELECT case_id, title, description, priority, status FROM cases ORDER BY case_id
+    """, (), fmt)
+
+CASES_PAGE_SIZE = 50
+CASES_MAX_PAGE_SIZE = 500
+
+# sort name -> (SQL expression, SQL type used to rebuild the cursor value).
+# Keys must never be NULL: a NULL cursor value matches nothing and ends paging
+CASE_SORT_KEYS = {
+    'case_id': ('case_id', 'BIGINT'),
+    'created_at': ("COALESCE(created_at, TIMESTAMP '0001-01-01')", 'TIMESTAMP'),
+    'updated_at': ("COALESCE(updated_at, TIMESTAMP '0001-01-01')", 'TIMESTAMP'),
+    'title': ("COALESCE(title, '')", 'VARCHAR'),
+    'priority': ("CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END", 'INTEGER'),
+}
+
+def encode_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {token}")
+
+def as_filter_list(value):
+    if value is None:
+        return None
+    return value if isinstance(value, list) else [value]
+
+def fetchCasesPage(con, data=None):
+    """Keyset-paginated cases. ``data`` may carry ``limit``, ``status`` and
+    ``priority`` filters (a value or a list), ``sort`` (see CASE_SORT_KEYS),
+    ``order`` ('asc'/'desc') and the ``cursor`` returned with the previous page."""
+    data = data or {}
+    sort = data.get('sort', 'case_id')
+    order = data.get('order', 'asc').lower()
+    if sort not in CASE_SORT_KEYS:
+        raise ValueError(f"Invalid sort: {sort}")
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Invalid order: {order}")
+    limit = max(1, min(int(data.get('limit') or CASES_PAGE_SIZE), CASES_MAX_PAGE_SIZE))
+    sort_expr, sort_type = CASE_SORT_KEYS[sort]
+
+    conditions = []
+    params = []
+    for column in ('status', 'priority'):
+        values = as_filter_list(data.get(column))
+        if values is not None:
+            conditions.append(f"list_contains(?, {column})")
+            params.append(values)
+
+    if data.get('cursor'):
+        cursor = decode_cursor(data['cursor'])
+        if cursor.get('sort') != sort or cursor.get('order') != order:
+            raise ValueError("Cursor does not match the requested sort order")
+        # Keyset condition on (sort key, case_id) so ties never repeat or skip rows
+        comparison = '>' if order == 'asc' else '<'
+        conditions.append(
+            f"({sort_expr} {comparison} CAST(? AS {sort_type}) "
+            f"OR ({sort_expr} = CAST(? AS {sort_type}) AND case_id {comparison} ?))"
+        )
+        params.extend([cursor['value'], cursor['value'], cursor['case_id']])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = con.execute(f"""
+        SELECT case_id, title, description, priority, status, {sort_expr} AS sort_value
+        FROM cases
+        {where}
+        ORDER BY sort_value {order}, case_id {order}
+        LIMIT ?
+    """, params + [limit + 1]).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     cases = [
         {
             'case_id': row[0],
@@ -555,8 +2288,204 @@ def fetchCases(data=None):
         }
         for row in rows
     ]
-    print("Emitting ", cases)
-    return cases
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor({
+            'sort': sort,
+            'order': order,
+            'value': rows[-1][5],
+            'case_id': rows[-1][0],
+        })
+
+    print("Emitting page of", len(cases), "cases")
+    return {'cases': cases, 'next_cursor': next_cursor}
+
+# Directory bulk_import is allowed to read files from (paths are resolved inside it)
+IMPORT_DIR = os.environ.get('BARANGAY_IMPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'imports'))
+
+# Load order matters: participants reference proceedings, proceedings reference cases
+BULK_IMPORT_TABLES = {
+    'cases': 'cases',
+    'proceedings': 'proceedings',
+    'participants': 'proceeding_participants',
+    'schedules': 'schedules',
+    'proceeding_schedules': 'proceeding_schedules',
+}
+
+# Case statuses the dashboard no longer counts as open
+CLOSED_CASE_STATUSES = ('resolved', 'closed')
+
+def month_start(value):
+    # 'YYYY-MM' or any ISO date -> first day of that month
+    return datetime.strptime(value[:7], '%Y-%m').date()
+
+def fetchDashboard(con, data=None):
+    """Case dashboard read from the rollup tables only, so its cost follows the
+    number of (priority, status) and (case, month) groups rather than rows.
+    ``data`` may carry case_id and a [from, to) month range ('YYYY-MM')."""
+    data = data or {}
+    current_tenant().rollups.flush(con)
+    status_rows = con.execute("""
+        SELECT priority, status, cases FROM rollup_case_status
+        WHERE cases > 0
+        ORDER BY priority, status
+    """).fetchall()
+    open_by_priority = {}
+    for priority, status, cases in status_rows:
+        if status not in CLOSED_CASE_STATUSES:
+            open_by_priority[priority] = open_by_priority.get(priority, 0) + cases
+
+    filters, params = ["proceedings > 0"], []
+    if data.get('case_id') is not None:
+        filters.append("case_id = ?")
+        params.append(data['case_id'])
+    if data.get('from'):
+        filters.append("month >= ?")
+        params.append(month_start(data['from']))
+    if data.get('to'):
+        filters.append("month < ?")
+        params.append(month_start(data['to']))
+    month_rows = con.execute(f"""
+        SELECT strftime(month, '%Y-%m'), SUM(proceedings)
+        FROM rollup_case_month
+        WHERE {' AND '.join(filters)}
+        GROUP BY month
+        ORDER BY month
+    """, params).fetchall()
+
+    resolution_rows = con.execute("""
+        SELECT priority, resolved_cases, resolution_seconds / resolved_cases / 3600
+        FROM rollup_case_resolution
+        WHERE resolved_cases > 0
+        ORDER BY priority
+    """).fetchall()
+
+    return {
+        'casesByStatus': [
+            {'priority': priority, 'status': status, 'cases': cases} for priority, status, cases in status_rows
+        ],
+        'openCasesByPriority': open_by_priority,
+        'proceedingsPerMonth': [{'month': month, 'proceedings': int(count)} for month, count in month_rows],
+        'resolution': [
+            {'priority': priority, 'resolvedCases': resolved, 'avgResolutionHours': round(hours, 2)}
+            for priority, resolved, hours in resolution_rows
+        ],
+    }
+
+FILE_READERS = {
+    'parquet': 'read_parquet',
+    'csv': 'read_csv_auto',
+}
+
+def resolve_import_path(path):
+    full_path = os.path.realpath(os.path.join(IMPORT_DIR, path))
+    if os.path.commonpath([full_path, os.path.realpath(IMPORT_DIR)]) != os.path.realpath(IMPORT_DIR):
+        raise ValueError(f"Import path outside import directory: {path}")
+    if not os.path.exists(full_path):
+        raise ValueError(f"Import file not found: {path}")
+    return full_path
+
+def import_source_relation(con, name, source, file_format=None):
+    # A string is a file in IMPORT_DIR; anything else (Arrow table, record batch
+    # reader, pandas DataFrame) is registered with DuckDB and scanned in place.
+    if isinstance(source, str):
+        path = resolve_import_path(source)
+        file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FILE_READERS:
+            raise ValueError(f"Unsupported import format: {file_format}")
+        return f"{FILE_READERS[file_format]}(?)", (path,)
+
+    view_name = f"bulk_import_{name}"
+    con.register(view_name, source)
+    return view_name, ()
+
+def reset_sequence_past(con, sequence_name):
+    table_name, id_column = ID_SEQUENCES[sequence_name]
+    max_id = con.execute(
+        f"SELECT COALESCE(MAX(TRY_CAST({id_column} AS BIGINT)), 0) FROM {table_name}"
+    ).fetchone()[0]
+    last_value = con.execute(
+        "SELECT COALESCE(last_value, start_value - 1) FROM duckdb_sequences() WHERE sequence_name = ?",
+        (sequence_name,)
+    ).fetchone()[0]
+    if max_id >= last_value:
+        con.execute(f"DROP SEQUENCE {sequence_name}")
+        con.execute(f"CREATE SEQUENCE {sequence_name} START {max_id + 1}")
+        return True
+    return False
+
+def bulk_import(con, data, file_format=None):
+    """Load cases, proceedings, participants and schedules in one transaction.
+
+    ``data`` maps 'cases' / 'proceedings' / 'participants' / 'schedules' /
+    'proceeding_schedules' to a file name in
+    IMPORT_DIR (Parquet or CSV) or an Arrow-compatible object. Columns are
+    matched to the table by name, so sources only need the columns they have.
+    """
+    file_format = file_format or data.get('format')
+    stats = {}
+    started = time.perf_counter()
+    registered = []
+
+    try:
+        with transaction(con):
+            for name, table_name in BULK_IMPORT_TABLES.items():
+                source = data.get(name)
+                if source is None:
+                    continue
+                relation, params = import_source_relation(con, name, source, file_format)
+                if not isinstance(source, str):
+                    registered.append(relation)
+
+                table_started = time.perf_counter()
+                rows = con.execute(
+                    f"INSERT INTO {table_name} BY NAME SELECT * FROM {relation}", params
+                ).fetchone()[0]
+                elapsed = time.perf_counter() - table_started
+                stats[name] = {
+                    "rows": rows,
+                    "seconds": round(elapsed, 4),
+                    "rows_per_sec": round(rows / elapsed) if elapsed > 0 else rows,
+                }
+
+            if 'participants' in stats:
+                backfill_people_counts(con)
+
+            # Imported rows are indexed with the same set-based statements
+            for doc_type, name in (('case', 'cases'), ('proceeding', 'proceedings')):
+                if name in stats:
+                    reindex_search(con, doc_type, missing_only=True)
+            if stats.keys() & {'cases', 'proceedings'}:
+                current_tenant().rollups.mark_all(con)
+
+            reset = [
+                sequence_name for sequence_name in ('case_id_seq', 'proceeding_id_seq', 'schedule_id_seq')
+                if reset_sequence_past(con, sequence_name)
+            ]
+    finally:
+        for view_name in registered:
+            con.unregister(view_name)
+        # Any of this tenant's cases and proceedings may have changed
+        result_cache.invalidate_tenant(current_tenant().name)
+
+    # Imported IDs may overlap blocks the allocators already reserved
+    tenant = current_tenant()
+    for allocator in (tenant.case_ids, tenant.proceeding_ids, tenant.schedule_ids):
+        if allocator.sequence_name in reset:
+            allocator.reset()
+    if 'schedules' in stats:
+        tenant.schedule_index.load(con)
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(table_stats["rows"] for table_stats in stats.values())
+    stats["total"] = {
+        "rows": total_rows,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(total_rows / elapsed) if elapsed > 0 else total_rows,
+    }
+    print("Bulk import finished:", stats["total"])
+    return stats
+
 # (Assume tables created already...)
 
 # Example data
@@ -584,54 +2513,1296 @@ participants = [
 
 # Usage:
 #print(get_case_proceedings_json(con, case_id=1))
-from threading import Lock
+# Wire formats a client may ask for at register_user, best first. 'json' is the
+# original list-of-dicts payload; the others ship column arrays (see
+# rows_to_columnar), as plain JSON, a msgpack blob or an Arrow IPC stream.
+WIRE_FORMATS = [fmt for fmt, available in (
+    ('arrow', pyarrow is not None),
+    ('msgpack', msgpack is not None),
+    ('columnar', True),
+    ('json', True),
+) if available]
+
+class SessionRegistry:
+    """Per-connection state (username, wire format, barangay id) by sid, as
+    seen by every worker. Changes are applied locally and published on the
+    message bus, so a worker serving a forwarded query knows sessions
+    connected to other workers.
+    """
 
-user_sid_map = {}
-map_lock = Lock()
+    def __init__(self, bus, channel='sessions'):
+        self.bus = bus
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._sessions = {}
+        self._lock = Lock()
+        bus.subscribe(channel, self._receive)
+
+    def update(self, sid, **fields):
+        self.apply(sid, fields)
+        self.bus.publish(self.channel, {'origin': self.origin, 'sid': sid, 'fields': fields})
+
+    def remove(self, sid):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        self.bus.publish(self.channel, {'origin': self.origin, 'sid': sid, 'removed': True})
+        return session
+
+    def apply(self, sid, fields):
+        with self._lock:
+            self._sessions.setdefault(sid, {}).update(fields)
+
+    def _receive(self, message):
+        if message.get('origin') == self.origin:
+            return
+        if message.get('removed'):
+            with self._lock:
+                self._sessions.pop(message['sid'], None)
+        else:
+            self.apply(message['sid'], message['fields'])
+
+    def get(self, sid):
+        with self._lock:
+            return dict(self._sessions.get(sid, ()))
+
+    def format(self, sid):
+        # Clients that never asked get 'json'
+        return self.get(sid).get('format', 'json')
+
+    def tenant(self, sid):
+        return self.get(sid).get('barangay_id', DEFAULT_TENANT)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions)}
+
+sessions = SessionRegistry(message_bus)
+
+def negotiate_format(requested):
+    for fmt in WIRE_FORMATS:
+        if fmt in (requested or []):
+            return fmt
+    return 'json'
+
+def records_to_columnar(records):
+    columns = list(records[0].keys())
+    return rows_to_columnar(columns, [tuple(record.get(column) for column in columns) for record in records])
+
+def is_columnar(payload):
+    return isinstance(payload, dict) and 'columns' in payload and 'values' in payload
+
+def encode_payload(payload, fmt):
+    """Returns (format actually used, data) for a handler result. Payloads that
+    aren't tables (single records, nested dicts) always go out as JSON."""
+    if fmt == 'json':
+        return 'json', payload
+    if is_columnar(payload):
+        columnar = payload
+    elif isinstance(payload, list) and payload and all(isinstance(record, dict) for record in payload):
+        columnar = records_to_columnar(payload)
+    else:
+        return 'json', payload
+
+    if fmt == 'msgpack':
+        return fmt, msgpack.packb(columnar)
+    if fmt == 'arrow':
+        table = pyarrow.table(dict(zip(columnar['columns'], columnar['values'])))
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return fmt, sink.getvalue().to_pybytes()
+    return 'columnar', columnar
 
 @socketio.on('register_user')
 def register_user(data):
     print(f"Received registration for user: {data['username']}")
-    with map_lock:
-        user_sid_map[data['username']] = request.sid
+    barangay_id = str(data.get('barangay_id') or DEFAULT_TENANT)
+    if not tenants.is_valid(barangay_id):
+        emit('registered', {'error': 'invalid_barangay', 'message': f"Invalid barangay id: {barangay_id!r}"})
+        return
+    fmt = negotiate_format(data.get('formats'))
+    previous = sessions.tenant(request.sid)
+    sessions.update(request.sid, username=data['username'], format=fmt, barangay_id=barangay_id)
+    # The case list feed follows the client to its barangay
+    leave_room(cases_room(previous))
+    join_room(cases_room(barangay_id))
+    emit('registered', {'format': fmt, 'formats': WIRE_FORMATS, 'barangay_id': barangay_id})
 
 @socketio.on('connect')
 def handle_connect():
     print("Client connected")
+    # Every client watches the case list; per-case rooms are opt-in
+    join_room(cases_room(DEFAULT_TENANT))
     emit('server_message', {'response': 'Connected to Flask server'})
 
+@socketio.on('subscribe_case')
+def subscribe_case(data):
+    join_room(case_room(data['case_id'], sessions.tenant(request.sid)))
+
+@socketio.on('unsubscribe_case')
+def unsubscribe_case(data):
+    leave_room(case_room(data['case_id'], sessions.tenant(request.sid)))
+
 @socketio.on('disconnect')
 def on_disconnect():
-    sid = request.sid
-    # Remove any user associated with this SID
-    for user, user_sid in list(user_sid_map.items()):
-        if user_sid == sid:
-            print(f"{user} disconnected")
-            del user_sid_map[user]
-            break
+    # Drop the session on every worker
+    session = sessions.remove(request.sid)
+    if session and session.get('username'):
+        print(f"{session['username']} disconnected")
 
 query_funcs = {
     1: create_case,
-    2: fetchCases,
+    2: cached_query(2, fetchCases, lambda data: ['cases']),
     3: create_proceeding,
     4: update_proceeding,
     5: get_case_proceedings_json,
-    6: fetchProceedings,
+    6: cached_query(6, fetchProceedings, lambda data: [proceedings_tag(data['case_id'])]),
     7: delete_proceeding,
-    8: delete_case
+    8: delete_case,
+    9: cached_query(9, fetchProceedingsForCases,
+                    lambda data: [proceedings_tag(case_id) for case_id in data.get('case_ids', []) or []]),
+    10: bulk_import,
+    11: cached_query(11, fetchCasesPage, lambda data: ['cases']),
+    12: check_schedule_conflicts,
+    13: fetchTimeline,
+    14: searchProceedings,
+    15: fetchDashboard,
+    16: cached_query(16, fetchProceedingSummaries, lambda data: [proceedings_tag(data['case_id'])]),
+    17: fetchProceeding,
+}
+
+# Handlers that build the column-oriented payload directly in SQL, used in
+# place of query_funcs for clients on a non-JSON wire format
+columnar_query_funcs = {
+    2: cached_query(('columnar', 2), fetchCasesColumnar, lambda data: ['cases']),
+    6: cached_query(('columnar', 6), fetchProceedingsColumnar, lambda data: [proceedings_tag(data['case_id'])]),
+    16: cached_query(('columnar', 16), fetchProceedingSummariesColumnar,
+                     lambda data: [proceedings_tag(data['case_id'])]),
 }
 
+# Handlers for query_db requests sent with stream: true. They return an
+# iterator of (format, data, rows) chunks; other query_ids stream their
+# normal result as a single chunk.
+stream_query_funcs = {
+    2: streamCases,
+    6: streamProceedings,
+    16: streamProceedingSummaries,
+}
+
+# Mutations that may be grouped into a shared commit by the write batcher.
+# Deletes stay out: their cascades need a commit between phases.
+WRITE_QUERY_IDS = {1, 3, 4}
+# Handlers that commit on their own, so a transactional query_batch can't hold them
+NON_TRANSACTIONAL_QUERY_IDS = {7, 8}
+
+class WriteBatcher:
+    """Groups mutations that arrive within a short window into one transaction.
+
+    Every submitted mutation waits at most ``window_ms`` for company, then the
+    whole group runs on one cursor and pays a single commit. If any mutation in
+    the group fails, the group is rolled back and each mutation is retried in
+    its own transaction, so one bad request can't fail its neighbours.
+    """
+
+    def __init__(self, pool, handlers, window_ms=WRITE_BATCH_WINDOW_MS, max_size=WRITE_BATCH_MAX_SIZE,
+                 tenant=None):
+        self.pool = pool
+        self.handlers = handlers
+        self.tenant = tenant
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, query_id, data):
+        future = Future()
+        self._pending.put((query_id, data, future))
+        return future
+
+    def close(self):
+        # Stops the thread once queued mutations have run
+        self._pending.put(None)
+
+    def _collect(self):
+        first = self._pending.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._pending.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        # Handlers look up allocators, indexes and rooms through the tenant
+        _current_tenant.set(self.tenant)
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # e.g. PoolTimeout: fail this batch and keep serving the next
+                print("Write batch failed:", repr(e))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch):
+        with self.pool.cursor() as cur:
+            try:
+                with transaction(cur):
+                    results = [self.handlers[query_id](cur, data) for query_id, data, _ in batch]
+            except Exception:
+                self._run_individually(cur, batch)
+                return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_individually(self, cur, batch):
+        for query_id, data, future in batch:
+            try:
+                with transaction(cur):
+                    result = self.handlers[query_id](cur, data)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+class Tenant:
+    """One barangay's database and the in-memory state derived from it."""
+
+    def __init__(self, name, path, con, pool, case_ids, proceeding_ids, schedule_ids,
+                 schedule_index, rollups):
+        self.name = name
+        self.path = path
+        self.con = con
+        self.pool = pool
+        self.case_ids = case_ids
+        self.proceeding_ids = proceeding_ids
+        self.schedule_ids = schedule_ids
+        self.schedule_index = schedule_index
+        self.rollups = rollups
+        self.write_batcher = WriteBatcher(pool, query_funcs, tenant=self) if WRITE_BATCH_WINDOW_MS > 0 else None
+        self.active = 0  # requests in flight; guarded by the registry lock
+        self.last_used = time.monotonic()
+
+    @classmethod
+    def open(cls, name, path):
+        con = open_database(path)
+        index = ScheduleIndex()
+        index.load(con)
+        return cls(name, path, con, CursorPool(con), IdAllocator('case_id_seq'),
+                   IdAllocator('proceeding_id_seq'), IdAllocator('schedule_id_seq'),
+                   index, RollupMaintainer())
+
+    def close(self):
+        if self.write_batcher:
+            self.write_batcher.close()
+        try:
+            self.rollups.flush(self.con)
+            set_rollups_clean(self.con, True)
+            self.pool.close()
+            if self.path != ':memory:':
+                checkpoint(self.con)
+            self.con.close()
+        except duckdb.Error as e:
+            print("Closing tenant", self.name, "failed:", e)
+
+class TenantNotOwned(Exception):
+    def __init__(self, name):
+        super().__init__(f"Barangay {name!r} is served by worker {tenant_owner(name)}")
+        self.name = name
+        self.owner = tenant_owner(name)
+
+class TenantRegistry:
+    """Opens barangay databases on first use and closes them once idle.
+
+    Each tenant is its own DuckDB file (``<barangay_id>.duckdb`` in
+    ``directory``), so one barangay's heavy report only competes for its own
+    cursors and files stay small. Beyond ``max_open`` tenants, or after
+    ``idle_seconds`` without a request, the least recently used tenant with
+    nothing in flight is checkpointed and closed. The default tenant is never
+    closed, and neither is anything when DB_PATH is ':memory:' (closing an
+    in-memory tenant would drop its data).
+    """
+
+    NAME_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+    def __init__(self, default, directory=TENANT_DIR, max_open=TENANT_MAX_OPEN,
+                 idle_seconds=TENANT_IDLE_SECONDS):
+        self.default = default
+        self.directory = directory
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._tenants = OrderedDict([(default.name, default)])
+        self._opening = {}  # name -> Future, so concurrent first requests open once
+        self._lock = Lock()
+        self._metrics = {"opened": 0, "closed": 0}
+
+    def is_valid(self, name):
+        return bool(self.NAME_PATTERN.fullmatch(name))
+
+    def path_for(self, name):
+        if DB_PATH == ':memory:':
+            return ':memory:'
+        return os.path.join(self.directory, f"{name}.duckdb")
+
+    def acquire(self, name):
+        if not self.is_valid(name):
+            raise ValueError(f"Invalid barangay id: {name!r}")
+        if not owns_tenant(name):
+            raise TenantNotOwned(name)
+        while True:
+            with self._lock:
+                tenant = self._tenants.get(name)
+                if tenant is not None:
+                    self._tenants.move_to_end(name)
+                    tenant.active += 1
+                    tenant.last_used = time.monotonic()
+                    break
+                opening = self._opening.get(name)
+                if opening is None:
+                    opening = self._opening[name] = Future()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                # Another request is opening it; raises if that failed
+                opening.result()
+                continue
+
+            # Opened outside the lock so other tenants aren't held up
+            try:
+                if DB_PATH != ':memory:':
+                    os.makedirs(self.directory, exist_ok=True)
+                tenant = Tenant.open(name, self.path_for(name))
+            except BaseException as e:
+                with self._lock:
+                    del self._opening[name]
+                opening.set_exception(e)
+                raise
+            with self._lock:
+                del self._opening[name]
+                self._tenants[name] = tenant
+                tenant.active += 1
+                self._metrics["opened"] += 1
+            opening.set_result(tenant)
+            print("Opened tenant:", name)
+            break
+
+        self.evict()
+        return tenant
+
+    def release(self, tenant):
+        with self._lock:
+            tenant.active -= 1
+            tenant.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, name):
+        tenant = self.acquire(name)
+        token = _current_tenant.set(tenant)
+        try:
+            yield tenant
+        finally:
+            _current_tenant.reset(token)
+            self.release(tenant)
+
+    def evict(self):
+        if DB_PATH == ':memory:':
+            return
+        evicted = []
+        with self._lock:
+            now = time.monotonic()
+            excess = len(self._tenants) - self.max_open
+            # OrderedDict order is least recently used first
+            for name, tenant in list(self._tenants.items()):
+                if tenant is self.default or tenant.active:
+                    continue
+                if excess > 0 or now - tenant.last_used > self.idle_seconds:
+                    del self._tenants[name]
+                    evicted.append(tenant)
+                    excess -= 1
+            self._metrics["closed"] += len(evicted)
+        for tenant in evicted:
+            tenant.close()
+            print("Closed tenant:", tenant.name)
+
+    def close_all(self):
+        with self._lock:
+            evicted = [tenant for tenant in self._tenants.values() if tenant is not self.default]
+            self._tenants = OrderedDict([(self.default.name, self.default)])
+        for tenant in evicted:
+            tenant.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": len(self._tenants),
+                "max_open": self.max_open,
+                "opening": len(self._opening),
+                "in_use": sum(1 for tenant in self._tenants.values() if tenant.active),
+                **self._metrics,
+            }
+
+    def pool_stats(self):
+        # Cursor pool stats of every open tenant, by tenant name
+        with self._lock:
+            open_tenants = list(self._tenants.values())
+        return {tenant.name: tenant.pool.stats() for tenant in open_tenants}
+
+def run_tenant_sweeper(registry, interval, stop_event):
+    while not stop_event.wait(interval):
+        registry.evict()
+
+def start_tenant_sweeper(registry):
+    if registry.idle_seconds <= 0 or DB_PATH == ':memory:':
+        return None
+    stop_event = threading.Event()
+    interval = min(registry.idle_seconds, 60)
+    thread = threading.Thread(target=run_tenant_sweeper, args=(registry, interval, stop_event), daemon=True)
+    thread.start()
+    return stop_event
+
+# The module-level con/db_pool/allocators are the default tenant's
+default_tenant = Tenant(DEFAULT_TENANT, DB_PATH, con, db_pool, case_ids, proceeding_ids,
+                        schedule_ids, schedule_index, rollups)
+tenants = TenantRegistry(default_tenant)
+atexit.register(tenants.close_all)
+
+class QueryTimeout(Exception):
+    pass
+
+class DeadlineWatcher:
+    """Interrupts cursors still running at their deadline, from one thread.
+
+    Each watch() is a lease on the cursor. Leaving it drops the lease under the
+    lock the watcher holds while interrupting, so a cursor is never
+    interrupted once it has gone back to the pool and another request may be
+    using it.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []    # (deadline, token), earliest first
+        self._leases = {}  # token -> cursor, for leases not yet released
+        self._tokens = itertools.count()
+        self._thread = None
+
+    @contextmanager
+    def watch(self, cur, deadline):
+        with self._cond:
+            token = next(self._tokens)
+            self._leases[token] = cur
+            heapq.heappush(self._heap, (deadline, token))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-deadlines', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        try:
+            yield cur
+        finally:
+            with self._cond:
+                self._leases.pop(token, None)  # gone already if it was interrupted
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                # Due entries are interrupted; released ones are just dropped
+                while self._heap and (self._heap[0][0] <= now or self._heap[0][1] not in self._leases):
+                    deadline, token = heapq.heappop(self._heap)
+                    cur = self._leases.pop(token, None)
+                    if cur is not None:
+                        try:
+                            cur.interrupt()
+                        except Exception as e:
+                            print("Interrupting a query at its deadline failed:", repr(e))
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+
+# Histogram bucket bounds: seconds for phase timings, bytes for payloads
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class QueryMetrics:
+    """Per-query_id timings of each dispatch phase (queue wait, database,
+    serialization, emit), payload sizes and outcomes, in Prometheus text
+    format. A sample of requests is also logged as one summary line."""
+
+    PHASES = ('queue', 'db', 'serialize', 'emit')
+
+    def __init__(self, log_sample=QUERY_LOG_SAMPLE):
+        self.log_sample = log_sample
+        self._lock = Lock()
+        self._phases = {}    # (query_id, phase) -> Histogram
+        self._payloads = {}  # query_id -> Histogram
+        self._outcomes = {}  # (query_id, outcome) -> count
+
+    def observe(self, query_id, outcome, timings, payload_bytes=None, rows=None, sid=None):
+        query_id = str(query_id)
+        with self._lock:
+            key = (query_id, outcome)
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+            for phase, seconds in timings.items():
+                histogram = self._phases.get((query_id, phase))
+                if histogram is None:
+                    histogram = self._phases[(query_id, phase)] = Histogram(LATENCY_BUCKETS)
+                histogram.observe(seconds)
+            if payload_bytes is not None:
+                histogram = self._payloads.get(query_id)
+                if histogram is None:
+                    histogram = self._payloads[query_id] = Histogram(PAYLOAD_BUCKETS)
+                histogram.observe(payload_bytes)
+
+        if random.random() < self.log_sample:
+            print("query", json.dumps({
+                "query_id": query_id,
+                "sid": sid,
+                "outcome": outcome,
+                "rows": rows,
+                "bytes": payload_bytes,
+                **{f"{phase}_ms": round(seconds * 1000, 3) for phase, seconds in timings.items()},
+            }))
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP barangay_query_phase_seconds Time spent in each query_db dispatch phase",
+                "# TYPE barangay_query_phase_seconds histogram",
+            ]
+            for (query_id, phase), histogram in sorted(self._phases.items()):
+                lines += histogram.render("barangay_query_phase_seconds", f'query_id="{query_id}",phase="{phase}"')
+            lines += [
+                "# HELP barangay_query_payload_bytes Encoded size of query_db responses",
+                "# TYPE barangay_query_payload_bytes histogram",
+            ]
+            for query_id, histogram in sorted(self._payloads.items()):
+                lines += histogram.render("barangay_query_payload_bytes", f'query_id="{query_id}"')
+            lines += [
+                "# HELP barangay_queries_total query_db requests by outcome",
+                "# TYPE barangay_queries_total counter",
+            ]
+            for (query_id, outcome), count in sorted(self._outcomes.items()):
+                lines.append(f'barangay_queries_total{{query_id="{query_id}",outcome="{outcome}"}} {count}')
+        return lines
+
+query_metrics = QueryMetrics()
+
+def payload_rows(payload):
+    # Row count for log summaries: lists and RawJSON count their items, dicts
+    # add up their list-valued members (e.g. fetchCasesPage's 'cases')
+    if isinstance(payload, (list, RawJSON)):
+        return len(payload)
+    if isinstance(payload, dict):
+        if is_columnar(payload):
+            return payload['length']
+        return sum(payload_rows(value) for value in payload.values() if isinstance(value, (list, dict, RawJSON)))
+    return 1 if payload is not None else 0
+
+class QueryDispatcher:
+    """Runs query_db handlers on worker threads so the Socket.IO handler returns
+    immediately and heartbeats/other clients are never stuck behind the database.
+
+    At most ``queue_limit`` requests may be queued or running; beyond that the
+    client gets a 'busy' response right away. Each request has a deadline
+    covering queue wait and execution; a query still running at the deadline
+    is interrupted and the client gets a 'timeout' response.
+    """
+
+    def __init__(self, registry, handlers, columnar_handlers=None, stream_handlers=None,
+                 workers=QUERY_WORKERS, queue_limit=QUERY_QUEUE_LIMIT, timeout=QUERY_TIMEOUT):
+        self.registry = registry
+        self.handlers = handlers
+        self.columnar_handlers = columnar_handlers or {}
+        self.stream_handlers = stream_handlers or {}
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+        self._deadlines = DeadlineWatcher()
+        self._depth = 0
+        self._lock = Lock()
+        self._metrics = {"submitted": 0, "rejected": 0, "completed": 0, "errors": 0, "timeouts": 0}
+
+    def _admit(self):
+        with self._lock:
+            if self._depth >= self.queue_limit:
+                self._metrics["rejected"] += 1
+                return False
+            self._depth += 1
+            self._metrics["submitted"] += 1
+        return True
+
+    def submit(self, sid, query_id, data):
+        if not self._admit():
+            return False
+        queued_at = time.monotonic()
+        self._executor.submit(self._run, sid, query_id, data, queued_at, queued_at + self.timeout)
+        return True
+
+    def submit_stream(self, sid, query_id, data, stream_id):
+        if not self._admit():
+            return False
+        queued_at = time.monotonic()
+        self._executor.submit(self._run_stream, sid, query_id, data, stream_id,
+                              queued_at, queued_at + self.timeout)
+        return True
+
+    def submit_batch(self, sid, batch_id, operations, transactional=False):
+        # A whole batch takes one queue slot and one deadline
+        if not self._admit():
+            return False
+        queued_at = time.monotonic()
+        self._executor.submit(self._run_batch, sid, batch_id, operations, transactional,
+                              queued_at, queued_at + self.timeout)
+        return True
+
+    def handler_for(self, query_id, fmt, in_transaction=False):
+        handler = self.handlers[query_id]
+        if fmt != 'json':
+            handler = self.columnar_handlers.get(query_id, handler)
+        if in_transaction:
+            # Reads must see the transaction's own writes, not the cache
+            handler = getattr(handler, 'uncached', handler)
+        return handler
+
+    def execute(self, query_id, data, deadline, fmt='json'):
+        if query_id not in self.handlers:
+            raise ValueError(f"Unknown query_id: {query_id}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QueryTimeout("Request expired while queued")
+
+        tenant = current_tenant()
+        if tenant.write_batcher and query_id in WRITE_QUERY_IDS:
+            try:
+                return tenant.write_batcher.submit(query_id, data).result(timeout=remaining)
+            except FutureTimeout:
+                raise QueryTimeout("Write batch did not finish in time")
+
+        try:
+            with tenant.pool.cursor(timeout=remaining) as cur, self._deadlines.watch(cur, deadline):
+                handler = self.handler_for(query_id, fmt)
+                try:
+                    return handler(cur, data)
+                except duckdb.InterruptException:
+                    raise QueryTimeout("Query interrupted at deadline")
+        except PoolTimeout:
+            raise QueryTimeout("No database cursor became free in time")
+
+    def _run_stream(self, sid, query_id, data, stream_id, queued_at, deadline):
+        """Send a result as ordered chunks, {query_id, stream_id, seq, format,
+        data}, then {query_id, stream_id, done: true, chunks, rows}. At least one
+        chunk is sent, possibly empty. Only one chunk is in memory at a time,
+        and the cursor stays checked out until the last one is emitted."""
+        fmt = sessions.format(sid)
+        label = query_id if query_id in self.handlers else 'unknown'
+        started = time.monotonic()
+        timings = {'queue': started - queued_at, 'db': 0.0, 'serialize': 0.0, 'emit': 0.0}
+        chunks = rows = payload_bytes = 0
+        try:
+            if query_id not in self.handlers:
+                raise ValueError(f"Unknown query_id: {query_id}")
+            if started >= deadline:
+                raise QueryTimeout("Request expired while queued")
+            with self.registry.use(sessions.tenant(sid)) as tenant:
+                with tenant.pool.cursor(timeout=max(deadline - time.monotonic(), 0)) as cur, \
+                        self._deadlines.watch(cur, deadline):
+                    try:
+                        if query_id in self.stream_handlers:
+                            parts = self.stream_handlers[query_id](cur, data, fmt)
+                        else:
+                            output = self.handler_for(query_id, fmt)(cur, data)
+                            parts = iter([encode_payload(output, fmt) + (payload_rows(output),)])
+                        fetched = time.monotonic()
+                        for chunk_fmt, chunk, chunk_rows in parts:
+                            timings['db'] += time.monotonic() - fetched
+                            payload_bytes += self._emit_chunk(sid, query_id, stream_id, chunks, chunk_fmt, chunk, timings)
+                            chunks += 1
+                            rows += chunk_rows
+                            fetched = time.monotonic()
+                        timings['db'] += time.monotonic() - fetched
+                        if not chunks:
+                            payload_bytes += self._emit_chunk(sid, query_id, stream_id, 0, 'json', [], timings)
+                            chunks = 1
+                    except duckdb.InterruptException:
+                        raise QueryTimeout("Query interrupted at deadline")
+        except (QueryTimeout, PoolTimeout) as e:
+            self._count("timeouts")
+            query_metrics.observe(label, 'timeout', timings, sid=sid)
+            emit_stream_error(sid, query_id, stream_id, 'timeout', str(e))
+        except Exception as e:
+            self._count("errors")
+            query_metrics.observe(label, 'error', timings, sid=sid)
+            print("Stream", query_id, "failed:", repr(e))
+            emit_stream_error(sid, query_id, stream_id, 'error', str(e))
+        else:
+            self._count("completed")
+            socketio.emit('server_message', {
+                'query_id': query_id,
+                'stream_id': stream_id,
+                'done': True,
+                'chunks': chunks,
+                'rows': rows,
+            }, to=sid)
+            query_metrics.observe(label, 'ok', timings, payload_bytes, rows, sid=sid)
+        finally:
+            with self._lock:
+                self._depth -= 1
+
+    def _emit_chunk(self, sid, query_id, stream_id, seq, fmt, chunk, timings):
+        wire_stats.encoded_bytes = 0
+        wire_stats.encode_seconds = 0.0
+        emitted = time.monotonic()
+        socketio.emit('server_message', {
+            'query_id': query_id,
+            'stream_id': stream_id,
+            'seq': seq,
+            'format': fmt,
+            'data': chunk,
+        }, to=sid)
+        timings['serialize'] += wire_stats.encode_seconds
+        timings['emit'] += max(time.monotonic() - emitted - wire_stats.encode_seconds, 0.0)
+        return wire_stats.encoded_bytes + (len(chunk) if isinstance(chunk, bytes) else 0)
+
+    def execute_batch(self, operations, transactional, deadline, fmt='json'):
+        """Run ``operations`` ({query_id, data}) in order on one cursor.
+
+        Returns one result per operation, shaped like a query_db reply. Without
+        ``transactional`` each operation commits on its own and a failure only
+        fails that operation. With it, the batch is one transaction: a failure
+        rolls back the whole batch and the other operations report
+        'rolled_back' or 'skipped'.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QueryTimeout("Request expired while queued")
+        try:
+            with current_tenant().pool.cursor(timeout=remaining) as cur, self._deadlines.watch(cur, deadline):
+                if transactional:
+                    return self._execute_transaction(cur, operations, fmt)
+                return self._execute_each(cur, operations, fmt)
+        except PoolTimeout:
+            raise QueryTimeout("No database cursor became free in time")
+
+    def _execute_each(self, cur, operations, fmt):
+        results = []
+        for index, operation in enumerate(operations):
+            query_id = operation['query_id']
+            try:
+                output = self.handler_for(query_id, fmt)(cur, operation.get('data'))
+            except duckdb.InterruptException:
+                results.append(batch_error(query_id, 'timeout', "Query interrupted at deadline"))
+                results.extend(batch_error(op['query_id'], 'skipped') for op in operations[index + 1:])
+                break
+            except Exception as e:
+                print("Query", query_id, "failed:", repr(e))
+                results.append(batch_error(query_id, 'error', str(e)))
+            else:
+                results.append(batch_result(query_id, output, fmt))
+        return results
+
+    def _execute_transaction(self, cur, operations, fmt):
+        outputs = []
+        try:
+            with transaction(cur):
+                for operation in operations:
+                    handler = self.handler_for(operation['query_id'], fmt, in_transaction=True)
+                    outputs.append(handler(cur, operation.get('data')))
+        except Exception as e:
+            failed = len(outputs)
+            print("Batch rolled back at query", operations[failed]['query_id'], "-", repr(e))
+            error = 'timeout' if isinstance(e, duckdb.InterruptException) else 'error'
+            return (
+                [batch_error(op['query_id'], 'rolled_back') for op in operations[:failed]]
+                + [batch_error(operations[failed]['query_id'], error, str(e))]
+                + [batch_error(op['query_id'], 'skipped') for op in operations[failed + 1:]]
+            )
+        return [batch_result(op['query_id'], output, fmt) for op, output in zip(operations, outputs)]
+
+    def _run_batch(self, sid, batch_id, operations, transactional, queued_at, deadline):
+        fmt = sessions.format(sid)
+        started = time.monotonic()
+        timings = {'queue': started - queued_at}
+        try:
+            with self.registry.use(sessions.tenant(sid)):
+                results = self.execute_batch(operations, transactional, deadline, fmt)
+            timings['db'] = time.monotonic() - started
+        except QueryTimeout as e:
+            self._count("timeouts")
+            timings['db'] = time.monotonic() - started
+            query_metrics.observe('batch', 'timeout', timings, sid=sid)
+            emit_batch_error(sid, batch_id, 'timeout', str(e))
+        except Exception as e:
+            self._count("errors")
+            timings['db'] = time.monotonic() - started
+            query_metrics.observe('batch', 'error', timings, sid=sid)
+            print("Batch", batch_id, "failed:", repr(e))
+            emit_batch_error(sid, batch_id, 'error', str(e))
+        else:
+            self._count("completed")
+            wire_stats.encoded_bytes = 0
+            wire_stats.encode_seconds = 0.0
+            emitted = time.monotonic()
+            socketio.emit('server_message', {'batch_id': batch_id, 'results': results}, to=sid)
+            timings['serialize'] = wire_stats.encode_seconds
+            timings['emit'] = max(time.monotonic() - emitted - wire_stats.encode_seconds, 0.0)
+            rows = sum(payload_rows(result.get('data')) for result in results)
+            query_metrics.observe('batch', 'ok', timings, wire_stats.encoded_bytes, rows, sid=sid)
+        finally:
+            with self._lock:
+                self._depth -= 1
+
+    def _run(self, sid, query_id, data, queued_at, deadline):
+        fmt = sessions.format(sid)
+        # Arbitrary client-sent ids would make unbounded metric label sets
+        label = query_id if query_id in self.handlers else 'unknown'
+        started = time.monotonic()
+        timings = {'queue': started - queued_at}
+        try:
+            with self.registry.use(sessions.tenant(sid)):
+                output = self.execute(query_id, data, deadline, fmt)
+            finished = time.monotonic()
+            timings['db'] = finished - started
+            rows = payload_rows(output)
+            fmt, output = encode_payload(output, fmt)
+            encoded = time.monotonic()
+        except QueryTimeout as e:
+            self._count("timeouts")
+            timings['db'] = time.monotonic() - started
+            query_metrics.observe(label, 'timeout', timings, sid=sid)
+            emit_error(sid, query_id, 'timeout', str(e))
+        except Exception as e:
+            self._count("errors")
+            timings['db'] = time.monotonic() - started
+            query_metrics.observe(label, 'error', timings, sid=sid)
+            print("Query", query_id, "failed:", repr(e))
+            emit_error(sid, query_id, 'error', str(e))
+        else:
+            self._count("completed")
+            wire_stats.encoded_bytes = 0
+            wire_stats.encode_seconds = 0.0
+            # ✅ Only emit to the client who sent the message
+            socketio.emit('server_message', {
+                'query_id': query_id,
+                'format': fmt,
+                'data': output
+            }, to=sid)
+            # Packet encoding happens inside emit; WireJSON reports its share
+            timings['serialize'] = encoded - finished + wire_stats.encode_seconds
+            timings['emit'] = max(time.monotonic() - encoded - wire_stats.encode_seconds, 0.0)
+            payload_bytes = wire_stats.encoded_bytes + (len(output) if isinstance(output, bytes) else 0)
+            query_metrics.observe(label, 'ok', timings, payload_bytes, rows, sid=sid)
+        finally:
+            with self._lock:
+                self._depth -= 1
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"queue_depth": self._depth, "queue_limit": self.queue_limit, **self._metrics}
+
+def emit_error(sid, query_id, error, message=None):
+    socketio.emit('server_message', {
+        'query_id': query_id,
+        'error': error,
+        'message': message
+    }, to=sid)
+
+def emit_stream_error(sid, query_id, stream_id, error, message=None):
+    socketio.emit('server_message', {
+        'query_id': query_id,
+        'stream_id': stream_id,
+        'error': error,
+        'message': message
+    }, to=sid)
+
+def batch_result(query_id, output, fmt):
+    fmt, output = encode_payload(output, fmt)
+    return {'query_id': query_id, 'format': fmt, 'data': output}
+
+def batch_error(query_id, error, message=None):
+    return {'query_id': query_id, 'error': error, 'message': message}
+
+def emit_batch_error(sid, batch_id, error, message=None):
+    socketio.emit('server_message', {
+        'batch_id': batch_id,
+        'error': error,
+        'message': message
+    }, to=sid)
+
+def validate_batch(operations, transactional):
+    if not isinstance(operations, list) or not operations:
+        return "A batch needs a non-empty list of operations"
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return f"A batch may hold at most {BATCH_MAX_OPERATIONS} operations"
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('query_id') not in query_funcs:
+            return f"Unknown query_id in batch: {operation.get('query_id') if isinstance(operation, dict) else operation!r}"
+        if transactional and operation['query_id'] in NON_TRANSACTIONAL_QUERY_IDS:
+            return f"query_id {operation['query_id']} can't run in a transactional batch"
+    return None
+
+query_dispatcher = QueryDispatcher(tenants, query_funcs, columnar_query_funcs, stream_query_funcs)
+
+def forward_query(kind, sid, message):
+    """Hand a query_db/query_batch message to the worker that owns the
+    session's barangay. Returns False when that is this worker. The session
+    travels with it, since the owner may not have seen it on the bus yet;
+    replies are emitted to the sid and reach it through the message queue."""
+    session = sessions.get(sid)
+    owner = tenant_owner(session.get('barangay_id', DEFAULT_TENANT))
+    if owner == WORKER_INDEX:
+        return False
+    message_bus.publish(f"queries.{owner}", {'kind': kind, 'sid': sid, 'session': session, 'message': message})
+    return True
+
+def receive_forwarded_query(envelope):
+    sid = envelope['sid']
+    sessions.apply(sid, envelope['session'])
+    if envelope['kind'] == 'batch':
+        accept_batch(sid, envelope['message'])
+    else:
+        accept_query(sid, envelope['message'])
+
+message_bus.subscribe(f"queries.{WORKER_INDEX}", receive_forwarded_query)
+
 @socketio.on('query_db')
 def handle_client_message(data):
-    print('Received from client:', data)
-    output = query_funcs[data['query_id']](data["data"])
-    # ✅ Only emit to the client who sent the message
-    emit('server_message', {
-        'query_id': data['query_id'],
-        'data': output
-    }, to=user_sid_map['user'])
-
-    print("Emitted", {'query_id': data['query_id'], 'data': output}, "to SID:", user_sid_map['user'])
+    if not forward_query('query', request.sid, data):
+        accept_query(request.sid, data)
+
+def accept_query(sid, data):
+    if data.get('stream'):
+        # Chunked reply; the client may name the stream, otherwise we do
+        stream_id = data.get('stream_id') or uuid.uuid4().hex
+        if not query_dispatcher.submit_stream(sid, data['query_id'], data.get("data"), stream_id):
+            query_metrics.observe(data['query_id'] if data['query_id'] in query_funcs else 'unknown', 'busy', {})
+            emit_stream_error(sid, data['query_id'], stream_id, 'busy',
+                              "Server is at its query queue limit, retry later")
+        return
+    if not query_dispatcher.submit(sid, data['query_id'], data.get("data")):
+        # Backpressure: tell the client to retry instead of queueing unboundedly
+        query_metrics.observe(data['query_id'] if data['query_id'] in query_funcs else 'unknown', 'busy', {})
+        emit_error(sid, data['query_id'], 'busy', "Server is at its query queue limit, retry later")
+
+@socketio.on('query_batch')
+def handle_query_batch(message):
+    # {batch_id, operations: [{query_id, data}, ...], transactional}; answered
+    # with one server_message {batch_id, results: [...]} in operation order
+    if not forward_query('batch', request.sid, message):
+        accept_batch(request.sid, message)
+
+def accept_batch(sid, message):
+    batch_id = message.get('batch_id')
+    operations = message.get('operations')
+    transactional = bool(message.get('transactional'))
+    problem = validate_batch(operations, transactional)
+    if problem:
+        emit_batch_error(sid, batch_id, 'invalid', problem)
+        return
+    if not query_dispatcher.submit_batch(sid, batch_id, operations, transactional):
+        query_metrics.observe('batch', 'busy', {})
+        emit_batch_error(sid, batch_id, 'busy', "Server is at its query queue limit, retry later")
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+ATTACHMENT_COLUMNS = ('attachment_id', 'case_id', 'proceeding_id', 'sha256', 'filename',
+                      'content_type', 'size', 'uploaded_by', 'created_at')
+
+# Held while a blob is put in place and referenced, and while orphans are
+# removed, so cleanup never unlinks a file an upload has just deduplicated to
+_blob_lock = threading.RLock()
+
+def attachment_dir(tenant_name=None):
+    return os.path.join(ATTACHMENT_DIR, tenant_name or current_tenant().name)
+
+def blob_path(sha256, tenant_name=None):
+    # Fanned out by the first two hex digits to keep directories small
+    return os.path.join(attachment_dir(tenant_name), sha256[:2], sha256)
+
+def receive_blob(stream, max_bytes=ATTACHMENT_MAX_BYTES, chunk_bytes=ATTACHMENT_CHUNK_BYTES):
+    """Copy ``stream`` to a temporary file next to the blobs, hashing as it
+    goes, so an upload never sits in memory. Returns (path, sha256, size)."""
+    tmp_dir = os.path.join(attachment_dir(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_bytes)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AttachmentTooLarge(f"Attachment exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+def attachment_record(row):
+    attachment = dict(zip(ATTACHMENT_COLUMNS, row))
+    attachment['created_at'] = iso(attachment['created_at'])
+    return attachment
+
+def attachment_owner(con, case_id=None, proceeding_id=None):
+    # The case an attachment belongs to; proceeding attachments carry theirs too
+    if proceeding_id is not None:
+        row = con.execute("SELECT case_id FROM proceedings WHERE proceeding_id = ?", (proceeding_id,)).fetchone()
+        if not row:
+            raise LookupError(f"Unknown proceeding_id: {proceeding_id}")
+        if case_id is not None and case_id != row[0]:
+            raise ValueError(f"Proceeding {proceeding_id} does not belong to case {case_id}")
+        case_id = row[0]
+    elif case_id is not None:
+        if not con.execute("SELECT 1 FROM cases WHERE case_id = ?", (case_id,)).fetchone():
+            raise LookupError(f"Unknown case_id: {case_id}")
+    else:
+        raise ValueError("An attachment needs a case_id or proceeding_id")
+    return case_id
+
+def store_attachment(pool, stream, filename, content_type, case_id=None, proceeding_id=None, uploaded_by=None):
+    """Save an upload for a case or proceeding. Identical files share one blob
+    on disk; the returned record says whether this one was ``deduplicated``.
+    No cursor is held while the body is being received."""
+    with pool.cursor() as con:
+        case_id = attachment_owner(con, case_id, proceeding_id)
+
+    tmp_path, sha256, size = receive_blob(stream)
+    path = blob_path(sha256)
+    with pool.cursor() as con, _blob_lock:
+        deduplicated = os.path.exists(path)
+        if deduplicated:
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        try:
+            row = con.execute(f"""
+                INSERT INTO attachments (attachment_id, case_id, proceeding_id, sha256, filename,
+                                         content_type, size, uploaded_by)
+                VALUES (nextval('attachment_id_seq'), ?, ?, ?, ?, ?, ?, ?)
+                RETURNING {', '.join(ATTACHMENT_COLUMNS)}
+            """, (case_id, proceeding_id, sha256, filename, content_type, size, uploaded_by)).fetchone()
+        except duckdb.ConstraintException as e:
+            # The case or proceeding was deleted while the body was arriving
+            remove_unreferenced_blobs(con, [sha256])
+            raise LookupError(str(e)) from e
+        except BaseException:
+            remove_unreferenced_blobs(con, [sha256])
+            raise
+
+    attachment = attachment_record(row)
+    attachment['deduplicated'] = deduplicated
+    print("Stored attachment", attachment['attachment_id'], "-", size, "bytes", "(deduplicated)" if deduplicated else "")
+    return attachment
+
+def remove_unreferenced_blobs(con, hashes):
+    # Called after attachment rows are deleted; a blob goes once nothing points at it
+    hashes = sorted(set(hashes))
+    if not hashes:
+        return
+    with _blob_lock:
+        referenced = {row[0] for row in con.execute(
+            "SELECT DISTINCT sha256 FROM attachments WHERE list_contains(?, sha256)", (hashes,)
+        ).fetchall()}
+        for sha256 in hashes:
+            if sha256 in referenced:
+                continue
+            try:
+                os.unlink(blob_path(sha256))
+            except FileNotFoundError:
+                pass
+
+def get_attachment(con, attachment_id):
+    row = con.execute(
+        f"SELECT {', '.join(ATTACHMENT_COLUMNS)} FROM attachments WHERE attachment_id = ?", (attachment_id,)
+    ).fetchone()
+    return attachment_record(row) if row else None
+
+def list_attachments(con, case_id=None, proceeding_id=None):
+    column, value = ('proceeding_id', proceeding_id) if proceeding_id is not None else ('case_id', case_id)
+    rows = con.execute(f"""
+        SELECT {', '.join(ATTACHMENT_COLUMNS)} FROM attachments
+        WHERE {column} = ?
+        ORDER BY created_at, attachment_id
+    """, (value,)).fetchall()
+    return [attachment_record(row) for row in rows]
+
+def delete_attachment(con, attachment_id):
+    row = con.execute(
+        "DELETE FROM attachments WHERE attachment_id = ? RETURNING sha256", (attachment_id,)
+    ).fetchone()
+    if row:
+        remove_unreferenced_blobs(con, [row[0]])
+    return row is not None
+
+def request_tenant():
+    # HTTP has no register_user; the barangay comes with each request
+    return request.args.get('barangay_id') or request.headers.get('X-Barangay-Id') or DEFAULT_TENANT
+
+def request_int(name, values):
+    value = values.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+def http_error(status, error, message):
+    return jsonify({'error': error, 'message': message}), status
+
+@app.errorhandler(TenantNotOwned)
+def tenant_not_owned(e):
+    # HTTP requests must be routed by barangay; say which worker to use
+    response, status = http_error(421, 'wrong_worker', str(e))
+    response.headers['X-Barangay-Worker'] = str(e.owner)
+    return response, status
+
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+
+@app.route('/attachments', methods=['POST'])
+def upload_attachment():
+    # Either multipart/form-data with a 'file' part, or the raw file as the
+    # request body (filename in ?filename= or X-Filename)
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return http_error(400, 'invalid', "Multipart uploads need a 'file' part")
+        values = request.values
+        stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        values = request.args
+        stream = request.stream
+        filename = values.get('filename') or request.headers.get('X-Filename')
+        content_type = request.mimetype or 'application/octet-stream'
+    try:
+        case_id = request_int('case_id', values)
+        proceeding_id = request_int('proceeding_id', values)
+        with tenants.use(request_tenant()) as tenant:
+            attachment = store_attachment(tenant.pool, stream, filename, content_type, case_id, proceeding_id,
+                                          values.get('uploaded_by'))
+    except AttachmentTooLarge as e:
+        return http_error(413, 'too_large', str(e))
+    except LookupError as e:
+        return http_error(404, 'not_found', str(e))
+    except ValueError as e:
+        return http_error(400, 'invalid', str(e))
+    return jsonify(attachment), 201
+
+@app.route('/attachments', methods=['GET'])
+def get_attachments():
+    try:
+        case_id = request_int('case_id', request.args)
+        proceeding_id = request_int('proceeding_id', request.args)
+        if case_id is None and proceeding_id is None:
+            raise ValueError("Pass case_id or proceeding_id")
+        with tenants.use(request_tenant()) as tenant, tenant.pool.cursor() as con:
+            return jsonify(list_attachments(con, case_id, proceeding_id))
+    except ValueError as e:
+        return http_error(400, 'invalid', str(e))
+
+@app.route('/attachments/<int:attachment_id>', methods=['GET'])
+def download_attachment(attachment_id):
+    try:
+        with tenants.use(request_tenant()) as tenant, tenant.pool.cursor() as con:
+            attachment = get_attachment(con, attachment_id)
+            path = blob_path(attachment['sha256']) if attachment else None
+    except ValueError as e:
+        return http_error(400, 'invalid', str(e))
+    if attachment is None or not os.path.exists(path):
+        return http_error(404, 'not_found', f"No attachment {attachment_id}")
+    # send_file handles Range and If-None-Match itself and passes the open file
+    # to the WSGI server's file wrapper, which sends it with sendfile() where
+    # supported. Blobs never change, so the hash is a strong ETag.
+    return send_file(
+        path,
+        mimetype=attachment['content_type'] or 'application/octet-stream',
+        as_attachment=request.args.get('download') == '1',
+        download_name=attachment['filename'] or attachment['sha256'],
+        conditional=True,
+        etag=attachment['sha256'],
+        max_age=3600,
+    )
+
+@app.route('/attachments/<int:attachment_id>', methods=['DELETE'])
+def remove_attachment(attachment_id):
+    try:
+        with tenants.use(request_tenant()) as tenant, tenant.pool.cursor() as con:
+            deleted = delete_attachment(con, attachment_id)
+    except ValueError as e:
+        return http_error(400, 'invalid', str(e))
+    if not deleted:
+        return http_error(404, 'not_found', f"No attachment {attachment_id}")
+    return '', 204
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition: query histograms plus the current state of
+    # the dispatcher, cursor pools (one per open tenant) and result cache
+    lines = query_metrics.render()
+    for prefix, stats in (
+        ('query_dispatcher', query_dispatcher.stats()),
+        ('tenants', tenants.stats()),
+        ('sessions', sessions.stats()),
+        ('result_cache', result_cache.stats()),
+    ):
+        for key, value in stats.items():
+            lines.append(f"# TYPE barangay_{prefix}_{key} gauge")
+            lines.append(f"barangay_{prefix}_{key} {value}")
+    pool_stats = tenants.pool_stats()
+    for key in pool_stats[DEFAULT_TENANT]:
+        lines.append(f"# TYPE barangay_db_pool_{key} gauge")
+        for name, stats in pool_stats.items():
+            lines.append(f'barangay_db_pool_{key}{{tenant="{name}"}} {stats[key]}')
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000)
+    if owns_tenant(DEFAULT_TENANT):
+        start_checkpointer(con)
+    start_tenant_sweeper(tenants)
+    socketio.run(app, host='0.0.0.0', port=SERVER_PORT)
@@ -1,18 +1,19 @@
 import duckdb
 from datetime import datetime
 import json
+import os
 
-# Connect to an in-memory DuckDB instance (or to a file by passing a filename)
-con = duckdb.connect(':memory:')
+# Connect to an in-memory DuckDB instance by default, or to a file via SOMEDUCK_DB_PATH
+con = duckdb.connect(os.environ.get('SOMEDUCK_DB_PATH', ':memory:'))
 
 # Execute the SQL commands to create tables
 con.execute('''
-CREATE TABLE persons (
+CREATE TABLE IF NOT EXISTS persons (
     person_id INTEGER PRIMARY KEY,
     name VARCHAR
 );
 
-CREATE TABLE cases (
+CREATE TABLE IF NOT EXISTS cases (
     case_id INTEGER PRIMARY KEY,
     title VARCHAR,
     description TEXT,
@@ -28,7 +29,7 @@ CREATE TABLE cases (
     closed_by INTEGER REFERENCES persons(person_id)
 );
 
-CREATE TABLE schedules (
+CREATE TABLE IF NOT EXISTS schedules (
     schedule_id INTEGER PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     person_id INTEGER REFERENCES persons(person_id),
@@ -37,7 +38,7 @@ CREATE TABLE schedules (
     description TEXT
 );
 
-CREATE TABLE proceedings (
+CREATE TABLE IF NOT EXISTS proceedings (
     proceeding_id INTEGER PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -49,20 +50,20 @@ CREATE TABLE proceedings (
     status VARCHAR
 );
 
-CREATE TABLE proceeding_participants (
+CREATE TABLE IF NOT EXISTS proceeding_participants (
     proceeding_id INTEGER REFERENCES proceedings(proceeding_id),
     person_id INTEGER REFERENCES persons(person_id),
     role VARCHAR,
     PRIMARY KEY (proceeding_id, person_id)
 );
 
-CREATE TABLE proceeding_schedules (
+CREATE TABLE IF NOT EXISTS proceeding_schedules (
     proceeding_id INTEGER REFERENCES proceedings(proceeding_id),
     schedule_id INTEGER REFERENCES schedules(schedule_id),
     PRIMARY KEY (proceeding_id, schedule_id)
 );
 
-CREATE TABLE resolutions (
+CREATE TABLE IF NOT EXISTS resolutions (
     resolution_id INTEGER PRIMARY KEY,
     case_id INTEGER REFERENCES cases(case_id),
     title VARCHAR,
@@ -0,0 +1,223 @@
+"""Regression tests for the query handlers, run against an in-memory database:
+
+    cd backend && python -m pytest -q test_server.py
+"""
+import itertools
+import os
+import time
+
+os.environ.setdefault('BARANGAY_DB_PATH', ':memory:')
+
+import pytest
+
+import server
+
+_person_numbers = itertools.count(1000)
+_imported_case_ids = itertools.count(900000)
+
+
+@pytest.fixture
+def cur():
+    with server.tenants.use(server.DEFAULT_TENANT):
+        cursor = server.con.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+def make_case(cur, **fields):
+    data = {'title': 'Case', 'description': 'Test case', 'status': 'open', 'priority': 'high', **fields}
+    return server.create_case(cur, data)['case_id']
+
+
+def make_person(cur):
+    # Numeric, the way the frontend sends registered participants' ids
+    person_id = next(_person_numbers)
+    server.ensure_person_exists(cur, str(person_id), f"Person {person_id}")
+    return person_id
+
+
+def make_proceeding(cur, case_id, **fields):
+    data = {'caseId': case_id, 'summary': 'Hearing', 'content': 'Details', **fields}
+    return server.create_proceeding(cur, data)
+
+
+def test_numeric_person_ids_conflict_after_index_reload(cur):
+    case_id = make_case(cur)
+    person_id = make_person(cur)
+    participants = [{'id': person_id, 'name': 'Ana', 'role': 'complainant'}]
+    make_proceeding(cur, case_id, date='2024-05-01', startTime='09:00', endTime='10:00',
+                    participants=participants)
+
+    # A restart rebuilds the index from schedules.person_id (VARCHAR)
+    server.current_tenant().schedule_index.load(cur)
+
+    conflicts = server.check_schedule_conflicts(cur, {
+        'person_ids': [person_id], 'date': '2024-05-01', 'startTime': '09:30', 'endTime': '10:30',
+    })
+    assert list(conflicts) == [str(person_id)]
+    with pytest.raises(server.ScheduleConflict):
+        make_proceeding(cur, case_id, date='2024-05-01', startTime='09:30', endTime='10:30',
+                        participants=participants, rejectConflicts=True)
+
+
+def test_timeline_accepts_numeric_person_ids(cur):
+    case_id = make_case(cur)
+    person_id, other_id = make_person(cur), make_person(cur)
+    for date in ('2024-06-03', '2024-06-04', '2024-07-01'):
+        make_proceeding(cur, case_id, date=date, startTime='09:00', endTime='10:00',
+                        participants=[{'id': person_id, 'name': 'Ana', 'role': 'complainant'}])
+    make_proceeding(cur, case_id, date='2024-06-03', startTime='11:00', endTime='12:00',
+                    participants=[{'id': other_id, 'name': 'Ben', 'role': 'respondent'}])
+
+    days = server.fetchTimeline(cur, {'person_ids': [person_id], 'from': '2024-06-01', 'to': '2024-07-01'})
+
+    assert [day['day'] for day in days] == ['2024-06-03', '2024-06-04']
+    assert all(schedule['person_id'] == str(person_id) for day in days for schedule in day['schedules'])
+
+
+@pytest.mark.parametrize('sort', ['created_at', 'updated_at'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_cases_page_walks_past_null_sort_values(cur, sort, order):
+    status = f"paging-{sort}-{order}"
+    expected = {make_case(cur, status=status) for _ in range(7)}
+    # Rows imported without timestamps sort together under the NULL placeholder
+    for _ in range(8):
+        case_id = next(_imported_case_ids)
+        cur.execute("INSERT INTO cases (case_id, title, status, created_at, updated_at) "
+                    "VALUES (?, 'Imported', ?, NULL, NULL)", (case_id, status))
+        expected.add(case_id)
+
+    seen = []
+    page = {'status': status, 'sort': sort, 'order': order, 'limit': 3}
+    while True:
+        result = server.fetchCasesPage(cur, page)
+        seen.extend(case['case_id'] for case in result['cases'])
+        if not result['next_cursor']:
+            break
+        page['cursor'] = result['next_cursor']
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == expected
+
+
+def test_incremental_rollup_refresh_matches_full_refresh(cur):
+    case_ids = [make_case(cur, priority=priority) for priority in ('high', 'low', None)]
+    for case_id in case_ids:
+        make_proceeding(cur, case_id, date='2024-08-01', startTime='09:00', endTime='10:00')
+
+    def snapshot():
+        return [cur.execute(f"SELECT * FROM {table_name} ORDER BY ALL").fetchall()
+                for table_name in ('rollup_case_month', 'rollup_case_status', 'rollup_case_resolution')]
+
+    server.refresh_rollups(cur)
+    expected = snapshot()
+    cur.execute("DELETE FROM rollup_case_month")
+    cur.execute("DELETE FROM rollup_case_status")
+    cur.execute("DELETE FROM rollup_case_resolution")
+    all_case_ids = [row[0] for row in cur.execute("SELECT case_id FROM cases").fetchall()]
+    priorities = {row[0] or '' for row in cur.execute("SELECT DISTINCT priority FROM cases").fetchall()}
+    server.refresh_rollups(cur, all_case_ids, priorities)
+
+    assert snapshot() == expected
+
+
+def test_spool_bus_messages_are_json(tmp_path):
+    bus = server.SpoolBus(str(tmp_path), poll_interval=0.01)
+    received = []
+    bus.subscribe('socketio', received.append)
+    (tmp_path / 'socketio' / '.probe').write_text('')  # dot files are skipped
+    bus.publish('socketio', {'event': 'server_message', 'data': [{'rows': server.RawJSON('[[1,"a"]]', 1)}]})
+    # Anything else in the directory is data, never code: it is skipped
+    (tmp_path / 'socketio' / f"{time.time_ns():020d}-0-0.msg").write_bytes(b'\x80\x04K\x01.')
+
+    deadline = time.monotonic() + 5
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert received == [{'event': 'server_message', 'data': [{'rows': [[1, 'a']]}]}]
+
+
+def test_moving_a_proceeding_notifies_both_cases(cur, monkeypatch):
+    source_id, destination_id = make_case(cur), make_case(cur)
+    # No participants or schedules: DuckDB rejects updating an indexed column
+    # of a row that other tables reference
+    proceeding_id = make_proceeding(cur, source_id)
+    emitted = []
+    monkeypatch.setattr(server.socketio, 'emit', lambda event, change, to: emitted.append((to, change)))
+
+    server.update_proceeding(cur, {'id': proceeding_id, 'caseId': destination_id})
+
+    changes = dict(emitted)
+    assert changes[server.case_room(source_id)]['op'] == 'updated'
+    assert changes[server.case_room(source_id)]['fields'] == {'caseId': destination_id}
+    moved = changes[server.case_room(destination_id)]
+    assert (moved['op'], moved['id']) == ('created', proceeding_id)
+    assert moved['fields']['caseId'] == destination_id
+    assert moved['fields']['summary'] == 'Hearing'
+    assert moved['fields']['participants'] == []
+
+
+def test_deadline_watcher_interrupts_only_live_leases(cur):
+    watcher = server.DeadlineWatcher()
+    with watcher.watch(cur, time.monotonic() + 0.2):
+        with pytest.raises(server.duckdb.InterruptException):
+            cur.execute("SELECT count(*) FROM range(1000000000000) a WHERE a.range % 7 = 3").fetchall()
+
+    interrupted = []
+
+    class Cursor:
+        def interrupt(self):
+            interrupted.append(self)
+
+    released, running = Cursor(), Cursor()
+    with watcher.watch(released, time.monotonic() + 0.05):
+        pass
+    with watcher.watch(running, time.monotonic() + 0.05):
+        time.sleep(0.2)
+    time.sleep(0.1)
+    assert interrupted == [running]
+    assert cur.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_proceeding_participants_come_back_in_person_order(cur):
+    case_id = make_case(cur)
+    person_ids = [make_person(cur) for _ in range(4)]
+    participants = [{'id': person_id, 'name': f"P{person_id}", 'role': 'witness'} for person_id in reversed(person_ids)]
+    make_proceeding(cur, case_id, participants=participants)
+
+    [proceeding] = server.fetchProceedings(cur, {'case_id': case_id}).value()
+    assert [p['id'] for p in proceeding['participants']] == sorted(str(person_id) for person_id in person_ids)
+
+
+def test_metrics_report_each_tenants_cursor_pool():
+    with server.tenants.use('metrics-tenant'):
+        body = server.app.test_client().get('/metrics').get_data(as_text=True)
+
+    assert body.count('# TYPE barangay_db_pool_in_use gauge') == 1
+    assert 'barangay_db_pool_in_use{tenant="default"} ' in body
+    assert 'barangay_db_pool_in_use{tenant="metrics-tenant"} ' in body
+
+
+def test_search_snippets_highlight_terms_split_like_the_index(cur):
+    case_id = make_case(cur)
+    make_proceeding(cur, case_id, summary='Boundary hearing', content='The fence encroaches on the neighbour lot.')
+
+    result = server.searchProceedings(cur, {'query': 'fence_encroaches', 'types': ['proceeding'], 'case_id': case_id})
+
+    [hit] = result['results']
+    assert [hit['snippet'][a:b] for a, b in hit['highlights']] == ['fence', 'encroaches']
+
+
+def test_bulk_import_keeps_other_tenants_cached_reads(cur):
+    fetch_cases = server.query_funcs[2]
+    with server.tenants.use('cache-tenant') as tenant, tenant.pool.cursor() as other:
+        fetch_cases(other, {})
+    fetch_cases(cur, {})
+
+    server.bulk_import(cur, {})
+
+    cached = server.result_cache._entries
+    assert server.ResultCache.make_key(('cache-tenant', 2), {}) in cached
+    assert server.ResultCache.make_key((server.DEFAULT_TENANT, 2), {}) not in cached
@@ -1,16 +1,45 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './CaseManager.css';
 import Proceedings from './Proceedings';
 import { io } from 'socket.io-client';
 
 
 
+const upsertById = (items, item, key) => {
+  const exists = items.some(existing => String(existing[key]) === String(item[key]));
+  return exists
+    ? items.map(existing => (String(existing[key]) === String(item[key]) ? { ...existing, ...item } : existing))
+    : [...items, item];
+};
+
+const applyProceedingFields = (proceeding, fields) => {
+  const { participants: participantDiff, ...rest } = fields;
+  const updated = { ...proceeding, ...rest };
+  if (participantDiff && proceeding.participantCount !== undefined) {
+    // Summary rows (query 16) only carry a count
+    updated.participantCount = proceeding.participantCount
+      + participantDiff.added.length - participantDiff.removed.length;
+  }
+  if (participantDiff && proceeding.participants) {
+    const removed = new Set(participantDiff.removed.map(String));
+    const changed = new Map(participantDiff.changed.map(p => [String(p.id), p]));
+    updated.participants = (proceeding.participants || [])
+      .filter(p => !removed.has(String(p.id)))
+      .map(p => changed.get(String(p.id)) || p)
+      .concat(participantDiff.added);
+  }
+  return updated;
+};
+
 const CaseManager = () => {
   const [cases, setCases] = useState([]);
   const [selectedCase, setSelectedCase] = useState(null);
   const [showProceedings, setShowProceedings] = useState(false);
   const [showCreateForm, setShowCreateForm] = useState(false);
   const [proceedings, setProceedings] = useState([]);
+  // Case whose change-feed room we're in; a ref so the socket handlers
+  // registered once on mount see the current value
+  const subscribedCaseId = useRef(null);
   const socket = io('http://localhost:5000');
   const [newCase, setNewCase] = useState({
     case_id: null,
@@ -35,13 +64,29 @@ const CaseManager = () => {
     pending: '#ffc107', // yellow
   };
 
+  // Stay in at most one case room: leave the previous case's before joining
+  const followCase = (caseId) => {
+    if (subscribedCaseId.current === caseId) return;
+    if (subscribedCaseId.current !== null) {
+      socket.emit('unsubscribe_case', { case_id: subscribedCaseId.current });
+    }
+    if (caseId !== null) {
+      socket.emit('subscribe_case', { case_id: caseId });
+    }
+    subscribedCaseId.current = caseId;
+  };
+
   const handleCaseClick = (caseItem) => {
+    if (caseItem.case_id !== subscribedCaseId.current) {
+      followCase(null);
+    }
     setSelectedCase(caseItem);
     setShowProceedings(false);
     setShowCreateForm(false);
   };
 
   const handleCreateClick = () => {
+    followCase(null);
     setSelectedCase(null);
     setShowCreateForm(true);
     setShowProceedings(false);
@@ -59,7 +104,8 @@ const CaseManager = () => {
     1: (data) => {
       console.log('Received case creation response:', data);
       setRecievedCase(data);
-      setCases(prev => [...prev, data]);
+      // The change feed may have delivered this case already
+      setCases(prev => upsertById(prev, data, 'case_id'));
       console.log('New case created:', data);
       setNewCase({
           title: '',
@@ -77,8 +123,72 @@ const CaseManager = () => {
       console.log('Received proceedings:', data);
       setProceedings(data);
     },
+    16: (data) => {
+      setProceedings(data);
+    },
+    // Full proceeding by id; Proceedings listens for it itself
+    17: () => {},
   }
+  // Streamed replies (query_db with stream: true) arrive as ordered chunks;
+  // the first one replaces the list, later ones append to it
+  const streamProcesses = {
+    6: (chunk, first) => {
+      setProceedings(prev => (first ? chunk : [...prev, ...chunk]));
+    },
+    16: (chunk, first) => {
+      setProceedings(prev => (first ? chunk : [...prev, ...chunk]));
+    },
+  }
+  // Apply a change-feed delta ({entity, id, op, fields, version}) in place
+  // instead of refetching the whole list
+  const applyChange = (change) => {
+    if (change.entity === 'case') {
+      if (change.op === 'deleted') {
+        setCases(prev => prev.filter(c => c.case_id !== change.id));
+      } else {
+        setCases(prev => upsertById(prev, { case_id: change.id, ...change.fields }, 'case_id'));
+      }
+    } else if (change.entity === 'proceeding') {
+      // Only the open case's list is shown; ignore anything that belongs to
+      // another case (e.g. still in flight from a room we just left)
+      const otherCase = change.fields.caseId !== undefined
+        && String(change.fields.caseId) !== String(subscribedCaseId.current);
+      if (change.op === 'deleted') {
+        setProceedings(prev => prev.filter(p => String(p.id) !== String(change.id)));
+      } else if (change.op === 'created') {
+        if (!otherCase) {
+          setProceedings(prev => upsertById(prev, { id: change.id, ...change.fields }, 'id'));
+        }
+      } else if (otherCase) {
+        // Moved to another case
+        setProceedings(prev => prev.filter(p => String(p.id) !== String(change.id)));
+      } else {
+        setProceedings(prev => prev.map(p =>
+          String(p.id) === String(change.id) ? applyProceedingFields(p, change.fields) : p
+        ));
+      }
+    }
+  };
+
   const processMessage = (data) => {
+    if (data.results) {
+      // query_batch reply: one entry per operation, each shaped like a query_db reply
+      data.results.forEach(processMessage);
+      return;
+    }
+    if (data.error) {
+      // 'busy' (server queue full), 'timeout' or 'error'
+      console.warn(`Query ${data.query_id} failed (${data.error}):`, data.message);
+      return;
+    }
+    if (data.stream_id) {
+      if (data.done) {
+        console.log(`Stream ${data.stream_id} done: ${data.rows} rows in ${data.chunks} chunks`);
+      } else if (streamProcesses[data.query_id]) {
+        streamProcesses[data.query_id](data.data, data.seq === 0);
+      }
+      return;
+    }
     if (processes[data.query_id]) {
       processes[data.query_id](data.data);
     }
@@ -111,16 +221,20 @@ const CaseManager = () => {
   
     // ✅ Use the same handler reference
     socket.on('server_message', handler);
+    socket.on('change', applyChange);
   
     return () => {
       socket.off('server_message', handler); // ✅ now actually removes it
+      socket.off('change', applyChange);
     };
   }, []);
   
 
     const fetchProceedings = async () => {
       console.log('Fetching proceedings for case:', selectedCase.case_id);
-      socket.emit('query_db', { query_id: 6, data: { case_id: selectedCase.case_id } });
+      followCase(selectedCase.case_id);
+      // Summaries only; Proceedings fetches a proceeding's content when opened
+      socket.emit('query_db', { query_id: 16, data: { case_id: selectedCase.case_id }, stream: true });
     };
     const handleSubmit = async (e) => {
         e.preventDefault();
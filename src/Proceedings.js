@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './Proceedings.css';
 
 
@@ -29,6 +29,36 @@ const Proceedings = ({ socket, caseId, onClose, proceedings_temp }) => {
   useEffect(() => {
     setProceedings(proceedings_temp);
   }, [JSON.stringify(proceedings_temp)]);
+  // List rows are summaries (no content/participants); the full record is
+  // fetched by id (query 17) when a proceeding is opened or edited
+  const pendingEditId = useRef(null);
+  useEffect(() => {
+    const handler = (message) => {
+      if (message.query_id !== 17 || message.error || !message.data) return;
+      const full = message.data;
+      const sameId = (p) => p && String(p.id) === String(full.id);
+      setSelectedProceeding((prev) => (sameId(prev) ? { ...prev, ...full } : prev));
+      if (pendingEditId.current !== null && String(pendingEditId.current) === String(full.id)) {
+        pendingEditId.current = null;
+        setFormData({ ...full });
+        setIsEditing(true);
+        setShowForm(true);
+      }
+    };
+    socket.on('server_message', handler);
+    return () => socket.off('server_message', handler);
+  }, [socket]);
+
+  const loadProceeding = (id) => {
+    socket.emit('query_db', { query_id: 17, data: { id } });
+  };
+
+  const isLoaded = (proceeding) => proceeding.content !== undefined && proceeding.participants !== undefined;
+
+  const handleSelect = (proceeding) => {
+    setSelectedProceeding(proceeding);
+    if (!isLoaded(proceeding)) loadProceeding(proceeding.id);
+  };
   const resetForm = () => {
     setFormData({
       summary: '',
@@ -131,6 +161,12 @@ const Proceedings = ({ socket, caseId, onClose, proceedings_temp }) => {
   };
 
   const handleEdit = (proceeding) => {
+    if (!isLoaded(proceeding)) {
+      // Open the form once the full record arrives
+      pendingEditId.current = proceeding.id;
+      loadProceeding(proceeding.id);
+      return;
+    }
     setFormData({ ...proceeding });
     setIsEditing(true);
     setShowForm(true);
@@ -161,12 +197,12 @@ const Proceedings = ({ socket, caseId, onClose, proceedings_temp }) => {
               className={`proceeding-item ${
                 selectedProceeding?.id === proc.id ? 'selected' : ''
               }`}
-              onClick={() => setSelectedProceeding(proc)}
+              onClick={() => handleSelect(proc)}
             >
               <div className="proceeding-summary">
                 <h3>{proc.summary}</h3>
                 <span className="participant-count">
-                  {proc.participants.length} participants
+                  {proc.participantCount ?? (proc.participants || []).length} participants
                 </span>
               </div>
               <div className="proceeding-dates">
@@ -387,7 +423,7 @@ const Proceedings = ({ socket, caseId, onClose, proceedings_temp }) => {
           )}
           <div className="detail-group">
             <label>Content:</label>
-            <p>{selectedProceeding.content}</p>
+            <p>{selectedProceeding.content ?? 'Loading…'}</p>
           </div>
           <div className="detail-group">
             <label>Schedule:</label>
@@ -396,7 +432,7 @@ const Proceedings = ({ socket, caseId, onClose, proceedings_temp }) => {
           <div className="detail-group">
             <label>Participants:</label>
             <ul className="participant-list">
-              {selectedProceeding.participants.map((p, idx) => (
+              {(selectedProceeding.participants || []).map((p, idx) => (
                 <li key={idx}>
                   {p.name} - {p.role} ({p.type})
                 </li>
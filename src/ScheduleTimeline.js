@@ -17,6 +17,11 @@ const ScheduleTimeLine = () => {
     
   }
   const processMessage = (data) => {
+    if (data.error) {
+      // 'busy' (server queue full), 'timeout' or 'error'
+      console.warn(`Query ${data.query_id} failed (${data.error}):`, data.message);
+      return;
+    }
     if (processes[data.query_id]) {
       processes[data.query_id](data.data);
     }